@@ -0,0 +1,68 @@
+import hashlib
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import quote_etag
+
+from posts import caching
+
+from .projections import Projection, UnknownFields, requested
+
+
+def respond(data, status=200):
+    # Тексты постов — кириллица: \uXXXX вшестеро длиннее UTF-8
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def error(status, detail):
+    return respond({'detail': detail}, status)
+
+
+def with_fields(available, keys=()):
+    """Передаёт во view проекцию полей из ?fields=; неизвестные поля — 400."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                names = requested(request, available)
+            except UnknownFields as unknown:
+                return error(400, f'Неизвестные поля: {unknown}')
+            projection = Projection(available, names, keys)
+            return view(request, *args, projection=projection, **kwargs)
+        return wrapper
+    return decorator
+
+
+def etag_from_feeds(feeds):
+    """ETag ответа из поколений лент, от которых он зависит.
+
+    feeds(request, **kwargs) называет ленты. Поколения живут в кэше,
+    поэтому запрос с совпавшим If-None-Match получает 304, не трогая
+    базу. Версия читается до самого ответа: запись между ними только
+    сделает ETag устаревшим, и следующий запрос перечитает ленту.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            fingerprint = '|'.join((
+                request.get_full_path(),
+                caching.version(*feeds(request, **kwargs)),
+                # Ответы вошедшему читателю зависят от его подписок
+                str(request.user.pk),
+            ))
+            etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                patch_cache_control(response, max_age=0, must_revalidate=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
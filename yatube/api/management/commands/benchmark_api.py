@@ -0,0 +1,91 @@
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Rollback(Exception):
+    pass
+
+
+def count(queries, execute, sql, params, many, context):
+    queries.append(sql)
+    return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает HTML-страницы и их JSON-версии: время ответа, '
+            'число запросов и размер. Данные создаются в транзакции, '
+            'которая откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['posts'], options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        author = User.objects.create_user(username='benchmark-author')
+        reader = User.objects.create_user(username='benchmark-reader')
+        group = Group.objects.create(
+            title='Benchmark', slug='benchmark-group', description='')
+        Follow.objects.create(user=reader, author=author)
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Пост номер {number} ' * 10,
+                author=author, group=group)
+        for number in range(20):
+            Comment.objects.create(
+                post=post, author=reader, text=f'Комментарий {number}')
+        return author, reader, group, post
+
+    def run(self, posts, requests):
+        author, reader, group, post = self.seed(posts)
+        pairs = (
+            ('index', 'posts:index', 'api:index', []),
+            ('group', 'posts:group_list', 'api:group_posts', [group.slug]),
+            ('profile', 'posts:profile', 'api:profile', [author.username]),
+            ('follow', 'posts:follow_index', 'api:follow_index', []),
+            ('post', 'posts:post_detail', 'api:post_detail', [post.pk]),
+        )
+        client = Client()
+        client.force_login(reader)
+        for title, html, api, args in pairs:
+            for kind, name in (('html', html), ('json', api)):
+                url = reverse(name, args=args)
+                elapsed = 0
+                for _ in range(requests):
+                    # Холодный кэш: меряем сборку ответа, а не его копию
+                    cache.clear()
+                    # Журнал connection.queries чистится в начале каждого
+                    # запроса, поэтому запросы считает обёртка курсора
+                    queries = []
+                    with connection.execute_wrapper(
+                            partial(count, queries)):
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        elapsed += time.perf_counter() - started
+                etag = response.get('ETag')
+                revalidated = ''
+                if etag:
+                    started = time.perf_counter()
+                    client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    revalidated = (
+                        f', 304 за '
+                        f'{(time.perf_counter() - started) * 1000:.2f} мс')
+                self.stdout.write(
+                    f'{title:>8} {kind}: {elapsed / requests * 1000:.1f} мс, '
+                    f'запросов {len(queries)}, '
+                    f'{len(response.content) / 1024:.1f} КБ{revalidated}')
@@ -0,0 +1,102 @@
+"""Проекции моделей в JSON без экземпляров моделей.
+
+Каждое поле ответа — это путь ORM, и списки читаются через values()
+только по тем путям, которые клиент попросил в ?fields=. Строка values()
+переименовывается в ответ как есть, без __init__ моделей и без join
+с таблицами, поля которых не нужны.
+"""
+from posts.models import Post
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'parent': 'parent_id',
+    'depth': 'depth',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+# Поля, по которым листает курсор, читаются всегда
+POST_KEYS = ('pub_date', 'id')
+COMMENT_KEYS = ('path',)
+
+
+def _image_url(name):
+    return Post._meta.get_field('image').storage.url(name) if name else None
+
+
+# Поля, которые хранятся не в том виде, в каком отдаются
+CONVERTERS = {
+    'image': _image_url,
+}
+
+
+class UnknownFields(ValueError):
+    pass
+
+
+def requested(request, available):
+    """Имена полей из ?fields= (по умолчанию все) в порядке available."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(available)
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - set(available)
+    if unknown:
+        raise UnknownFields(', '.join(sorted(unknown)))
+    return [name for name in available if name in names]
+
+
+class Projection:
+    """Какие пути ORM читать и как строку values() превратить в ответ.
+
+    keys — поля, которые читаются, даже если их не просили: по ним
+    листает курсор.
+    """
+
+    def __init__(self, available, names, keys=()):
+        self.names = names
+        self.lookups = {
+            name: available.get(name, name)
+            for name in dict.fromkeys([*names, *keys])
+        }
+
+    def source(self, queryset, ordering, prefix=''):
+        """Источник пагинатора: (строки values(), сортировка, переименование).
+
+        prefix ведёт от строки источника к посту (у Timeline это post__).
+        """
+        lookups = {
+            name: prefix + lookup for name, lookup in self.lookups.items()}
+
+        def row(values):
+            return {name: values[lookup] for name, lookup in lookups.items()}
+        return queryset.values(*lookups.values()), ordering, row
+
+    def output(self, row):
+        result = {}
+        for name in self.names:
+            value = row[name]
+            convert = CONVERTERS.get(name)
+            result[name] = convert(value) if convert else value
+        return result
+
+    def get(self, queryset):
+        """Ответ по первой строке queryset или None."""
+        values, _, row = self.source(queryset, ())
+        found = values.first()
+        return None if found is None else self.output(row(found))
@@ -0,0 +1,96 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import changes
+from posts.models import Change, Comment, Group, Post, User
+
+
+class SyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.group = Group.objects.create(
+            title='Осень', slug='autumn', description='')
+        cls.post = Post.objects.create(
+            text='Старый', author=cls.author, group=cls.group)
+
+    def sync(self, **params):
+        return self.client.get(reverse('api:sync'), params)
+
+    def test_changes_since_cursor(self):
+        cursor = self.sync().json()['cursor']
+        self.assertEqual(cursor, changes.latest())
+        new = Post.objects.create(text='Новый', author=self.author)
+        comment = Comment.objects.create(
+            post=new, author=self.author, text='Комментарий')
+        old_id = self.post.pk
+        self.post.delete()
+        # Журнал, посты и комментарии пачки
+        with self.assertNumQueries(4):
+            data = self.sync(cursor=cursor, fields='id,text').json()
+        self.assertEqual(data['posts'], [{'id': new.pk, 'text': 'Новый'}])
+        self.assertEqual(
+            [(item['id'], item['post']) for item in data['comments']],
+            [(comment.pk, new.pk)])
+        self.assertEqual(
+            data['deleted'], {'posts': [old_id], 'comments': []})
+        self.assertEqual(data['cursor'], changes.latest())
+        data = self.sync(cursor=data['cursor']).json()
+        self.assertEqual(
+            (data['posts'], data['comments'], data['more']), ([], [], False))
+
+    def test_batches(self):
+        cursor = changes.latest()
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        texts = []
+        while True:
+            data = self.sync(cursor=cursor, limit=2).json()
+            texts += [post['text'] for post in data['posts']]
+            cursor = data['cursor']
+            if not data['more']:
+                break
+        self.assertEqual(texts, ['Пост 0', 'Пост 1', 'Пост 2'])
+
+    def test_scope(self):
+        cursor = changes.latest()
+        Post.objects.create(text='Вне группы', author=self.author)
+        self.post.save()
+        data = self.sync(cursor=cursor, group=self.group.slug).json()
+        self.assertEqual(
+            [post['id'] for post in data['posts']], [self.post.pk])
+        self.assertEqual(
+            self.sync(cursor=cursor, author='missing').status_code, 404)
+
+    def test_post_moved_between_groups(self):
+        other = Group.objects.create(
+            title='Зима', slug='winter', description='')
+        post = Post.objects.create(
+            text='Переезд', author=self.author, group=self.group)
+        cursor = changes.latest()
+        post.group = other
+        post.save()
+        data = self.sync(cursor=cursor, group=self.group.slug).json()
+        self.assertEqual(data['posts'], [])
+        self.assertEqual(data['deleted']['posts'], [post.pk])
+        data = self.sync(cursor=cursor, group=other.slug).json()
+        self.assertEqual(
+            [post['group'] for post in data['posts']], [other.slug])
+        self.assertEqual(data['deleted']['posts'], [])
+        # Без группы уход не виден: пост просто изменился
+        data = self.sync(cursor=cursor).json()
+        self.assertEqual(
+            [found['id'] for found in data['posts']], [post.pk])
+        self.assertEqual(data['deleted']['posts'], [])
+
+    def test_stale_and_bad_cursor(self):
+        for cursor in ('abc', '²', '٣', '-1'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(
+                    self.sync(cursor=cursor).status_code, 400)
+        self.assertEqual(self.sync(cursor=0, limit='²').status_code, 200)
+        Change.objects.update(created=self.post.pub_date.replace(year=2000))
+        changes.expire()
+        response = self.sync(cursor=0)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['cursor'], changes.latest())
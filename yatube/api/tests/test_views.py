@@ -0,0 +1,184 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import (Comment, FeedStrategy, Follow, Group, Post,
+                          Timeline, User)
+from posts.paginators import POSTS_PER_PAGE, encode_cursor
+
+# Щедрый потолок на ответ: ловит N+1 и рендеринг, а не шум машины
+LATENCY_BUDGET = 0.5
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.star = User.objects.create_user(username='Star')
+        cls.reader = User.objects.create_user(username='Ivan')
+        cls.group = Group.objects.create(
+            title='Осень', slug='autumn', description='Про осень')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        with override_settings(FEED_FANOUT_THRESHOLD=1):
+            # Star в pull-режиме: его посты подмешиваются при чтении
+            Follow.objects.create(user=cls.reader, author=cls.star)
+        start = timezone.now() - timedelta(days=1)
+        posts = []
+        for number in range(POSTS_PER_PAGE + 5):
+            post = Post.objects.create(
+                text=f'Пост {number}', group=cls.group,
+                author=cls.star if number % 3 == 0 else cls.author)
+            posts.append(post)
+        for number, post in enumerate(posts):
+            # Одинаковые даты у пар постов: курсор должен различать их по id
+            pub_date = start + timedelta(minutes=number // 2)
+            Post.objects.filter(pk=post.pk).update(pub_date=pub_date)
+            Timeline.objects.filter(post=post).update(pub_date=pub_date)
+        cls.post = posts[-1]
+        root = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Корень')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Ответ', parent=root)
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        """Адрес каждого эндпоинта и число запросов к базе на него."""
+        return {
+            reverse('api:index'): 1,
+            reverse('api:group_posts', args=[self.group.slug]): 2,
+            # Автор, его посты и счётчик постов
+            reverse('api:profile', args=[self.author.username]): 3,
+            # Пост и первая пачка комментариев
+            reverse('api:post_detail', args=[self.post.pk]): 2,
+            reverse('api:post_comments', args=[self.post.pk]): 2,
+        }
+
+    def walk(self, url):
+        """Все страницы ленты по ссылкам next."""
+        results = []
+        while url:
+            data = self.client.get(url).json()
+            results += data['results']
+            url = data['next']
+        return results
+
+    def test_endpoints_query_count_and_latency(self):
+        for url, queries in self.urls().items():
+            with self.subTest(url=url):
+                # Первый запрос прогревает поколения лент в кэше
+                self.client.get(url)
+                started = time.perf_counter()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertLess(
+                    time.perf_counter() - started, LATENCY_BUDGET)
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_index(self):
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        self.client.get(url)
+        # Сессия и читатель, авторы для ETag, стратегии, своя лента
+        # и посты pull-автора
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(FeedStrategy.objects.filter(
+            author=self.star, strategy=FeedStrategy.PULL).exists())
+        ids = [post['id'] for post in self.walk(url)]
+        self.assertEqual(ids, list(Post.objects.filter(
+            author__following__user=self.reader).values_list(
+            'pk', flat=True)))
+
+    def test_lists_do_not_build_models(self):
+        """Списки читаются через values(), без экземпляров моделей."""
+        with mock.patch.object(
+                Post, 'from_db', side_effect=AssertionError), \
+                mock.patch.object(
+                Comment, 'from_db', side_effect=AssertionError):
+            for url in self.urls():
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсор проходит ленту без пропусков и повторов."""
+        ids = [post['id'] for post in self.walk(reverse('api:index'))]
+        self.assertEqual(
+            ids, list(Post.objects.values_list('pk', flat=True)))
+        previous = self.client.get(
+            self.client.get(reverse('api:index')).json()['next']).json()
+        first = self.client.get(previous['previous']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results']],
+            ids[:POSTS_PER_PAGE])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        url = reverse('api:index')
+        first = self.client.get(url).json()['results']
+        for cursor in ('xx', encode_cursor(['2020-13-45 25:00:00', 1]),
+                       encode_cursor([None, None]),
+                       encode_cursor(['2020-01-01', None])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'], first)
+
+    def test_sparse_fields(self):
+        url = reverse('api:index')
+        data = self.client.get(url, {'fields': 'text,author'}).json()
+        self.assertEqual(
+            data['results'][0],
+            {'text': self.post.text, 'author': self.post.author.username})
+        # Выбор полей переживает переход на следующую страницу
+        self.assertIn('fields=text%2Cauthor', data['next'])
+        response = self.client.get(url, {'fields': 'text,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_post_detail(self):
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk]),
+            {'fields': 'id,image'}).json()
+        self.assertEqual(data['post'], {'id': self.post.pk, 'image': None})
+        self.assertEqual(
+            [(comment['text'], comment['depth'])
+             for comment in data['comments']['results']],
+            [('Корень', 0), ('Ответ', 1)])
+
+    def test_not_found(self):
+        for url in (
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:profile', args=['missing']),
+            reverse('api:post_detail', args=[0]),
+            reverse('api:post_comments', args=[0]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_etag_not_modified_until_feed_changes(self):
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comment_changes_post_etag(self):
+        url = reverse('api:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Ещё')
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,23 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    # Главная лента
+    path('posts/', views.index, name='index'),
+    # Пост с первой пачкой комментариев и остальные комментарии
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
+    # Ленты группы и автора
+    path('groups/<slug:slug>/posts/',
+         views.group_posts, name='group_posts'),
+    path('profiles/<str:username>/posts/',
+         views.profile, name='profile'),
+    # Лента подписок вошедшего читателя
+    path('follow/', views.follow_index, name='follow_index'),
+    # Изменения после курсора для клиентов, которые опрашивают ленты
+    path('sync/', views.sync, name='sync'),
+]
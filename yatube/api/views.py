@@ -0,0 +1,239 @@
+"""JSON-версии лент и поста: те же данные, что в posts.views, без шаблонов.
+
+Списки листаются только курсором (?cursor=) и читаются проекциями
+values(), см. api.projections. ETag каждого ответа собран из поколений
+тех же лент, что сбрасывают кэш HTML-страниц.
+"""
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from posts import caching, changes, counters, follows, timelines
+from posts.models import Change, Comment, Group, Post
+from posts.paginators import (COMMENTS_PER_PAGE, FEED_ORDERING,
+                              POSTS_PER_PAGE, MergedCursorPaginator)
+from posts.timelines import TIMELINE_ORDERING
+
+from .decorators import error, etag_from_feeds, respond, with_fields
+from .projections import (COMMENT_FIELDS, COMMENT_KEYS, GROUP_FIELDS,
+                          POST_FIELDS, POST_KEYS, Projection)
+
+User = get_user_model()
+
+
+class RowPaginator(MergedCursorPaginator):
+    """Курсорная страница строк проекций: позиция берётся из словаря."""
+
+    def get_position(self, row):
+        return [row[key] for key in self.keys]
+
+
+def _link(params, path, cursor):
+    if cursor is None:
+        return None
+    params = params.copy()
+    params['cursor'] = cursor
+    return f'{path}?{params.urlencode()}'
+
+
+def page(request, projection, sources, model=Post, ordering=FEED_ORDERING,
+         per_page=POSTS_PER_PAGE, path=None, params=None):
+    """Курсорная страница в виде {results, next, previous}.
+
+    path и params задают адрес соседних страниц; по умолчанию это
+    адрес и параметры самого запроса.
+    """
+    if params is None:
+        params = request.GET
+    paginator = RowPaginator(
+        sources, per_page, model.objects.none(), ordering=ordering)
+    page_obj = paginator.get_cursor_page(params.get('cursor'))
+    path = path or request.path
+    return {
+        'results': [projection.output(row) for row in page_obj],
+        'next': _link(params, path, page_obj.next_cursor),
+        'previous': _link(params, path, page_obj.previous_cursor),
+    }
+
+
+def _posts(request, projection, queryset):
+    return page(request, projection, [
+        projection.source(queryset, FEED_ORDERING)])
+
+
+@require_GET
+@etag_from_feeds(lambda request: [caching.index_feed()])
+@with_fields(POST_FIELDS, POST_KEYS)
+def index(request, projection):
+    return respond(_posts(request, projection, Post.objects.all()))
+
+
+@require_GET
+@etag_from_feeds(lambda request, slug: [caching.group_feed(slug)])
+@with_fields(POST_FIELDS, POST_KEYS)
+def group_posts(request, slug, projection):
+    group = Group.objects.filter(slug=slug).values(
+        'pk', *GROUP_FIELDS.values()).first()
+    if group is None:
+        return error(404, 'Группа не найдена')
+    posts = Post.objects.filter(group=group.pop('pk'))
+    return respond({
+        'group': group,
+        **_posts(request, projection, posts),
+    })
+
+
+def _profile_feeds(request, username):
+    feeds = [caching.profile_feed(username)]
+    if request.user.is_authenticated:
+        # В ответе есть и то, подписан ли на автора сам читатель
+        feeds.append(caching.follow_feed(request.user.pk))
+    return feeds
+
+
+@require_GET
+@etag_from_feeds(_profile_feeds)
+@with_fields(POST_FIELDS, POST_KEYS)
+def profile(request, username, projection):
+    author = User.objects.filter(username=username).values(
+        'pk', 'username', 'first_name', 'last_name').first()
+    if author is None:
+        return error(404, 'Автор не найден')
+    author_id = author.pop('pk')
+    author['posts'] = counters.get(counters.AUTHOR_POSTS, author_id)
+    if request.user.is_authenticated:
+        author['following'] = follows.is_following(request.user, author_id)
+    posts = Post.objects.filter(author=author_id)
+    return respond({
+        'author': author,
+        **_posts(request, projection, posts),
+    })
+
+
+def _follow_feeds(request):
+    if not request.user.is_authenticated:
+        return []
+    return timelines.follow_feeds(request.user)
+
+
+@require_GET
+@etag_from_feeds(_follow_feeds)
+@with_fields(POST_FIELDS, POST_KEYS)
+def follow_index(request, projection):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужно войти')
+    own, pulled = timelines.follow_sources(request.user)
+    sources = [projection.source(own, TIMELINE_ORDERING, 'post__')]
+    sources += [
+        projection.source(posts, FEED_ORDERING) for posts in pulled]
+    return respond(page(request, projection, sources))
+
+
+def _comments(request, post_id, projection, params=None):
+    comments = Comment.objects.filter(post=post_id)
+    return page(
+        request, projection,
+        [projection.source(comments, COMMENT_KEYS)],
+        model=Comment, ordering=COMMENT_KEYS, per_page=COMMENTS_PER_PAGE,
+        path=reverse('api:post_comments', args=[post_id]), params=params)
+
+
+@require_GET
+@etag_from_feeds(lambda request, post_id: [caching.post_feed(post_id)])
+@with_fields(POST_FIELDS)
+def post_detail(request, post_id, projection):
+    post = projection.get(Post.objects.filter(pk=post_id))
+    if post is None:
+        return error(404, 'Пост не найден')
+    # Первая пачка комментариев; ?fields= и ?cursor= относятся к посту
+    comments = Projection(COMMENT_FIELDS, list(COMMENT_FIELDS), COMMENT_KEYS)
+    return respond({
+        'post': post,
+        'comments': _comments(request, post_id, comments, QueryDict()),
+    })
+
+
+@require_GET
+@etag_from_feeds(lambda request, post_id: [caching.post_feed(post_id)])
+@with_fields(COMMENT_FIELDS, COMMENT_KEYS)
+def post_comments(request, post_id, projection):
+    """Комментарии поста в порядке обхода веток, вместе с ответами."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Пост не найден')
+    return respond(_comments(request, post_id, projection))
+
+
+def _objects(projection, model, ids):
+    values, _, row = projection.source(
+        model.objects.filter(pk__in=ids).order_by('pk'), ())
+    return [projection.output(row(found)) for found in values]
+
+
+def _number(value):
+    """Неотрицательное целое из параметра или None.
+
+    isdigit() пропускает цифры вроде «²», которые int() не разбирает.
+    """
+    if value.isascii() and value.isdecimal():
+        return int(value)
+    return None
+
+
+def _scope(request):
+    """Фильтр журнала по ?author= и ?group= или None, если их нет."""
+    scope = {}
+    if 'author' in request.GET:
+        scope['author_id'] = User.objects.filter(
+            username=request.GET['author']).values_list(
+            'pk', flat=True).first()
+    if 'group' in request.GET:
+        scope['group_id'] = Group.objects.filter(
+            slug=request.GET['group']).values_list('pk', flat=True).first()
+    if None in scope.values():
+        return None
+    return scope
+
+
+@require_GET
+@with_fields(POST_FIELDS)
+def sync(request, projection):
+    """Изменения после ?cursor=: объекты целиком и id удалённых.
+
+    Без курсора отдаётся только текущий номер: клиент читает ленту
+    целиком и дальше спрашивает изменения с него. ?fields= выбирает
+    поля постов.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is None:
+        return respond({'cursor': changes.latest()})
+    cursor = _number(cursor)
+    if cursor is None:
+        return error(400, 'Курсор — номер события')
+    if cursor < changes.horizon():
+        # События после курсора уже стёрты: частью изменений не обойтись
+        return respond({
+            'detail': 'Курсор устарел, перечитайте ленту',
+            'cursor': changes.latest(),
+        }, status=410)
+    limit = _number(request.GET.get('limit', ''))
+    if limit is None:
+        limit = changes.BATCH_SIZE
+    scope = _scope(request)
+    if scope is None:
+        return error(404, 'Автор или группа не найдены')
+    batch = changes.since(
+        cursor, min(max(limit, 1), changes.MAX_BATCH_SIZE), **scope)
+    comments = Projection(COMMENT_FIELDS, list(COMMENT_FIELDS))
+    return respond({
+        'cursor': batch.cursor,
+        'more': batch.more,
+        'posts': _objects(
+            projection, Post, batch.upserted[Change.POST]),
+        'comments': _objects(
+            comments, Comment, batch.upserted[Change.COMMENT]),
+        'deleted': {
+            'posts': batch.deleted[Change.POST],
+            'comments': batch.deleted[Change.COMMENT],
+        },
+    })
@@ -0,0 +1,270 @@
+# core/cache_backends.py
+"""Кэш в файле SQLite, общий для всех процессов-воркеров.
+
+LocMemCache у каждого процесса свой: с ростом числа воркеров падает
+доля попаданий, а сброс в одном процессе не виден остальным. Этот бэкенд
+хранит записи в одном файле SQLite (WAL), поэтому кэш общий, переживает
+перезапуск и не требует отдельного сервиса.
+
+Размер ограничен числом записей (MAX_ENTRIES) и байтами (MAX_BYTES),
+лишнее вытесняется по давности последнего чтения (LRU). Целые числа
+хранятся как INTEGER, и incr() — это один атомарный UPDATE. get_many и
+set_many обходятся одним запросом и одной транзакцией.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats (id, entries, bytes) VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry
+BEGIN
+    UPDATE cache_stats
+    SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_update AFTER UPDATE OF size
+ON cache_entry
+BEGIN
+    UPDATE cache_stats
+    SET bytes = bytes + NEW.size - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry
+BEGIN
+    UPDATE cache_stats
+    SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+"""
+
+UPSERT = """
+INSERT INTO cache_entry (key, value, expires, accessed, size)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed,
+    size = excluded.size
+"""
+
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+# Время последнего чтения обновляется не чаще раза в секунду,
+# чтобы горячие ключи не превращали каждое чтение в запись
+ACCESS_RESOLUTION = 1.0
+# SQLite ограничивает число параметров одного запроса
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        """Соединение текущего потока; после fork открывается новое."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self):
+        """Транзакция, сразу берущая блокировку записи у других процессов."""
+        return _Transaction(self._db)
+
+    @staticmethod
+    def _encode(value):
+        # Целые храним как есть, чтобы incr() шёл в SQL; bool — тоже int,
+        # но его надо вернуть именно bool, поэтому он идёт через pickle
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _set(self, db, key, value, timeout, now):
+        data, size = self._encode(value)
+        db.execute(UPSERT, (key, data, self.get_backend_timeout(timeout),
+                            now, size))
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        now = time.time()
+        db = self._db
+        found = {}
+        stale = []
+        for chunk in _chunks(made):
+            marks = ','.join('?' * len(chunk))
+            rows = db.execute(
+                f'SELECT key, value, accessed FROM cache_entry '
+                f'WHERE key IN ({marks}) AND {ALIVE}', (*chunk, now))
+            for made_key, value, accessed in rows:
+                found[made[made_key]] = self._decode(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(made_key)
+        for chunk in _chunks(stale):
+            marks = ','.join('?' * len(chunk))
+            db.execute(
+                f'UPDATE cache_entry SET accessed = ? '
+                f'WHERE key IN ({marks})', (now, *chunk))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as db:
+            for key, value in data.items():
+                self._set(db, self._key(key, version), value, timeout, now)
+            self._cull(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            exists = db.execute(
+                f'SELECT 1 FROM cache_entry WHERE key = ? AND {ALIVE}',
+                (key, now)).fetchone()
+            if exists:
+                return False
+            self._set(db, key, value, timeout, now)
+            self._cull(db, now)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            cursor = db.execute(
+                f'UPDATE cache_entry SET expires = ?, accessed = ? '
+                f'WHERE key = ? AND {ALIVE}',
+                (self.get_backend_timeout(timeout), now, key, now))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            updated = db.execute(
+                f"UPDATE cache_entry SET value = value + ?, accessed = ? "
+                f"WHERE key = ? AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, now, key, now)).rowcount
+            row = db.execute(
+                'SELECT value FROM cache_entry WHERE key = ?',
+                (key,)).fetchone() if updated else None
+        if row is None:
+            # Нет ключа или в нём не целое число — как у остальных бэкендов
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            f'SELECT 1 FROM cache_entry WHERE key = ? AND {ALIVE}',
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made = [self._key(key, version) for key in keys]
+        with self._write() as db:
+            for chunk in _chunks(made):
+                marks = ','.join('?' * len(chunk))
+                db.execute(
+                    f'DELETE FROM cache_entry WHERE key IN ({marks})', chunk)
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открывать файл на каждый запрос дорого
+        pass
+
+    def _cull(self, db, now):
+        """Держит кэш в пределах MAX_ENTRIES и MAX_BYTES."""
+        entries, size = db.execute(
+            'SELECT entries, bytes FROM cache_stats WHERE id = 1').fetchone()
+        if entries <= self._max_entries and size <= self._max_bytes:
+            return
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache_entry')
+            return
+        db.execute('DELETE FROM cache_entry WHERE expires <= ?', (now,))
+        while True:
+            entries, size = db.execute(
+                'SELECT entries, bytes FROM cache_stats WHERE id = 1'
+            ).fetchone()
+            if entries <= self._max_entries and size <= self._max_bytes:
+                return
+            # Как и LocMemCache, за раз освобождаем долю записей
+            db.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),))
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
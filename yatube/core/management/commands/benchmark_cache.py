@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends import SQLiteCache
+
+BACKENDS = {
+    'locmem': lambda location: LocMemCache(location, {}),
+    'filebased': lambda location: FileBasedCache(
+        location, {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+    'sqlite': lambda location: SQLiteCache(
+        f'{location}/cache.sqlite3', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+}
+# Похоже на карточку поста из ленты
+VALUE = 'x' * 2048
+
+
+def run(backend, location, operations):
+    """Пропускная способность (операций в секунду) одного процесса."""
+    cache = BACKENDS[backend](location)
+    keys = [f'key{i}' for i in range(operations)]
+    results = {}
+
+    started = time.perf_counter()
+    for key in keys:
+        cache.set(key, VALUE)
+    results['set'] = operations / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    results['get'] = operations / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for start in range(0, operations, 10):
+        cache.get_many(keys[start:start + 10])
+    results['get_many(10)'] = operations / (time.perf_counter() - started)
+
+    cache.set('counter', 0)
+    started = time.perf_counter()
+    for _ in range(operations):
+        cache.incr('counter')
+    results['incr'] = operations / (time.perf_counter() - started)
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность бэкендов кэша.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько процессов одновременно работают с кэшем.')
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        processes = options['processes']
+        self.stdout.write(
+            f'{operations} операций x {processes} процессов, ops/s')
+        for backend in BACKENDS:
+            location = tempfile.mkdtemp()
+            try:
+                with Pool(processes) as pool:
+                    runs = pool.starmap(
+                        run, [(backend, location, operations)] * processes)
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+            line = ', '.join(
+                f'{name}: {sum(result[name] for result in runs):,.0f}'
+                for name in runs[0])
+            self.stdout.write(f'{backend:>10}  {line}')
@@ -0,0 +1,28 @@
+"""Окружение тестов: кэш в памяти вместо общего файла SQLite.
+
+Тесты не должны читать и чистить кэш разработчика, а поколения лент,
+наборы подписок и страницы не должны переходить из прогона в прогон.
+Сам SQLiteCache проверяется в core/tests.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск manage.py test с кэшем из CACHES."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = override_settings(CACHES=CACHES)
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('MAX_ENTRIES', 10000)
+        return SQLiteCache(
+            f'{self.directory}/cache.sqlite3', {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Значения любых типов сохраняются и удаляются."""
+        for value in (1, True, 'строка', b'bytes', {'a': [1, 2]}, None):
+            with self.subTest(value=value):
+                self.cache.set('key', value)
+                self.assertEqual(self.cache.get('key', 'default'), value)
+                self.assertIs(type(self.cache.get('key')), type(value))
+        self.cache.delete('key')
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_add_and_touch(self):
+        """add не перезаписывает живой ключ, touch продлевает его."""
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.assertTrue(self.cache.touch('key', 10))
+        self.assertFalse(self.cache.touch('missing', 10))
+
+    def test_expiry(self):
+        """Просроченный ключ не читается и может быть добавлен заново."""
+        self.cache.set('key', 'value', 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_incr_is_shared_between_instances(self):
+        """Счётчик атомарно растёт и виден другому процессу (экземпляру)."""
+        self.cache.set('counter', 1)
+        other = self.make_cache()
+        self.assertEqual(other.incr('counter'), 2)
+        self.assertEqual(self.cache.decr('counter', 5), -3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_many(self):
+        """get_many, set_many и delete_many работают пачкой."""
+        data = {f'key{i}': i for i in range(1200)}
+        self.assertEqual(self.cache.set_many(data), [])
+        self.assertEqual(self.cache.get_many(data), data)
+        self.cache.delete_many(list(data)[:600])
+        self.assertEqual(len(self.cache.get_many(data)), 600)
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(data), {})
+
+    def test_lru_eviction_bounds_entries_and_bytes(self):
+        """Вытесняются давно не читавшиеся записи, размер ограничен."""
+        cache = self.make_cache(MAX_ENTRIES=10, MAX_BYTES=10 ** 6)
+        cache.set('hot', 'value')
+        for i in range(30):
+            cache.get('hot')
+            cache._db.execute(
+                "UPDATE cache_entry SET accessed = accessed + 100 "
+                "WHERE key LIKE '%hot'")
+            cache.set(f'key{i}', i)
+        entries, size = cache._db.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        self.assertLessEqual(entries, 10)
+        self.assertEqual(cache.get('hot'), 'value')
+        big = self.make_cache(MAX_BYTES=1000)
+        for i in range(10):
+            big.set(f'blob{i}', b'x' * 300)
+        self.assertLessEqual(
+            big._db.execute('SELECT bytes FROM cache_stats').fetchone()[0],
+            1000)
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 
-from .models import Group, Post
+from . import fulltext
+from .models import FeedStrategy, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +12,26 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            pk__in=fulltext.matching_posts(search_term)), False
+
+
+class FeedStrategyAdmin(admin.ModelAdmin):
+    list_display = ('author', 'strategy', 'followers', 'threshold',
+                    'changed')
+    list_filter = ('strategy',)
+    search_fields = ('author__username',)
+    readonly_fields = ('followers', 'threshold', 'changed')
+
+    def threshold(self, obj):
+        return settings.FEED_FANOUT_THRESHOLD
+    threshold.short_description = 'Порог pull-режима'
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
+admin.site.register(FeedStrategy, FeedStrategyAdmin)
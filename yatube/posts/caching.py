@@ -0,0 +1,212 @@
+"""Поколения кэша лент.
+
+У каждой ленты есть счётчик-поколение в кэше; записи, меняющие ленту,
+сдвигают его. Поколение входит в версию закэшированных фрагментов,
+поэтому записи живут долго, но устаревают сразу после изменения данных.
+
+get_or_build() защищает от лавины пересборок: ключ пересобирает только
+тот воркер, который взял блокировку, остальные в это время получают
+прежнюю версию, а горячие записи обновляются заранее, до истечения срока
+(вероятностно, по схеме XFetch), чтобы не истекать под нагрузкой разом.
+"""
+import hashlib
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'feed-generation'
+# Общее поколение для данных, которые видны во всех лентах:
+# названия групп и имена авторов
+SHARED = 'shared'
+
+STATS_PREFIX = 'stampede'
+# Счётчики stampede_stats(): все пересборки, из них досрочные, и запросы,
+# которые не стали пересобирать ключ, пока это делал другой воркер
+# (из них отданные устаревшей версией)
+EVENTS = ('rebuilds', 'early', 'collapsed', 'stale')
+# Чем больше, тем раньше до истечения срока начинается пересборка
+EARLY_BETA = 1.0
+# Блокировка переживает самую долгую разумную пересборку
+LOCK_TIMEOUT = 30
+# Сколько ждать чужую пересборку, если отдать пока нечего
+WAIT_TIMEOUT = 2.0
+WAIT_STEP = 0.05
+
+
+def index_feed():
+    return 'index'
+
+
+def group_feed(slug):
+    return f'group:{slug}'
+
+
+def profile_feed(username):
+    return f'profile:{username}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def post_feed(post_id):
+    return f'post:{post_id}'
+
+
+def tag_feed(name):
+    return f'tag:{name}'
+
+
+def _key(name):
+    # Слаги и имена пользователей бывают не-ASCII, а ключ должен
+    # подходить любому бэкенду кэша
+    return f'{KEY_PREFIX}:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def _changed_key(name):
+    return f'{_key(name)}:changed'
+
+
+def _initial():
+    # После вытеснения счётчик стартует с текущего времени, а не с нуля,
+    # чтобы не совпасть с одним из прежних поколений
+    return int(time.time() * 1000)
+
+
+def generations(*names):
+    """Текущие поколения лент: {имя: номер} одним запросом к кэшу."""
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        # Когда лента менялась до вытеснения, неизвестно: считаем, что сейчас
+        now = time.time()
+        cache.set_many({
+            **missing,
+            **{_changed_key(keys[key]): now for key in missing},
+        }, timeout=None)
+        found.update(missing)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def version(*names):
+    """Строка версии набора лент для ключа кэша фрагмента."""
+    current = generations(SHARED, *names)
+    return '.'.join(str(current[name]) for name in (SHARED,) + names)
+
+
+def changed_at(*names):
+    """Время последнего сдвига поколений (unix time) или None.
+
+    None, если отметка хотя бы одной ленты вытеснена из кэша: тогда
+    неизвестно, когда лента менялась в последний раз.
+    """
+    keys = [_changed_key(name) for name in (SHARED,) + names]
+    stamps = cache.get_many(keys)
+    if len(stamps) < len(keys):
+        return None
+    return max(stamps.values())
+
+
+def _fresh():
+    # Микросекунды и случайная добавка: новое поколение не совпадает
+    # ни с одним прежним, и читать старое значение не нужно
+    return int(time.time() * 1000000) * 1000 + random.randrange(1000)
+
+
+def bump(*names):
+    """Сдвигает поколения: всё закэшированное для этих лент устаревает.
+
+    Поколения только сравниваются на равенство, поэтому вместо incr
+    каждой ленты пишутся новые уникальные значения — одной записью
+    set_many, сколько бы лент ни было (например, у всех подписчиков).
+    """
+    now = time.time()
+    entries = {}
+    for name in names:
+        entries[_key(name)] = _fresh()
+        entries[_changed_key(name)] = now
+    cache.set_many(entries, timeout=None)
+
+
+def _count(event):
+    key = f'{STATS_PREFIX}:{event}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stampede_stats():
+    """Счётчики защиты от лавины пересборок: {событие: число}."""
+    found = cache.get_many([f'{STATS_PREFIX}:{event}' for event in EVENTS])
+    return {
+        event: found.get(f'{STATS_PREFIX}:{event}', 0) for event in EVENTS}
+
+
+def reset_stampede_stats():
+    cache.delete_many([f'{STATS_PREFIX}:{event}' for event in EVENTS])
+
+
+def _refresh_early(expires, delta, now):
+    """XFetch: чем дольше пересборка и ближе срок, тем вероятнее true."""
+    if expires is None:
+        return False
+    # 1 - random() лежит в (0, 1], логарифм от нуля не берётся
+    return now - delta * EARLY_BETA * math.log(1 - random.random()) >= expires
+
+
+def _store(key, version, value, delta, timeout):
+    expires = None if timeout is None else time.time() + timeout
+    # Запись живёт вдвое дольше своего срока: после него её ещё можно
+    # отдать, пока другой воркер собирает новую
+    cache.set(key, (version, value, delta, expires),
+              None if timeout is None else timeout * 2)
+
+
+def get_or_build(key, version, build, timeout, cacheable=None):
+    """Значение ключа версии version; при промахе собирается build().
+
+    Пересобирает только воркер, взявший блокировку ключа. Остальные
+    отдают прежнюю версию, а если её нет — ждут готовую до WAIT_TIMEOUT.
+    cacheable(value) может запретить сохранение (например, ответа 404).
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        stored_version, value, delta, expires = entry
+        fresh = stored_version == version and (
+            expires is None or expires > now)
+        if fresh and not _refresh_early(expires, delta, now):
+            return value
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            started = time.time()
+            value = build()
+            if cacheable is None or cacheable(value):
+                _store(key, version, value, time.time() - started, timeout)
+        finally:
+            cache.delete(lock)
+        _count('rebuilds')
+        if entry is not None and fresh:
+            _count('early')
+        return value
+    if entry is not None:
+        _count('collapsed')
+        _count('stale')
+        return entry[1]
+    deadline = now + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            _count('collapsed')
+            return entry[1]
+    # Держатель блокировки не успел: собираем сами, но не сохраняем,
+    # чтобы не перезаписать его результат
+    _count('rebuilds')
+    return build()
@@ -0,0 +1,160 @@
+"""Журнал изменений для клиентов, которые опрашивают ленты.
+
+Создание, правка и удаление поста, новый и удалённый комментарий пишут
+строку Change в той же транзакции, что и сама запись. Номера событий
+растут монотонно, и клиенту достаточно помнить последний увиденный:
+since() отдаёт следующие события пачкой, где от нескольких событий
+одного объекта остаётся итог. Номер выдаётся при вставке, а не при
+коммите; в SQLite записи идут по одной, и порядки совпадают.
+
+Старый журнал не копится. compact() в сегментах старше
+CHANGES_COMPACT_AFTER удаляет события, за которыми у того же объекта
+есть более новые; событие ухода поста из группы перекрывают только
+события той же группы. expire() стирает события старше
+CHANGES_RETENTION_DAYS и запоминает горизонт — номер последнего
+стёртого. Клиент с курсором до горизонта мог что-то пропустить
+и должен перечитать ленту целиком.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import Change, Comment, Counter, Post
+
+BATCH_SIZE = 200
+# Id пачки читаются через IN, а SQLite ограничивает число параметров
+MAX_BATCH_SIZE = 500
+SEGMENT_SIZE = 10000
+# Горизонт хранится строкой таблицы счётчиков
+HORIZON = 'changes_horizon'
+
+Batch = namedtuple('Batch', 'cursor more upserted deleted')
+
+
+def record(entity, action, object_id, post):
+    Change.objects.create(
+        entity=entity, action=action, object_id=object_id,
+        post_id=post.pk, author_id=post.author_id, group_id=post.group_id)
+
+
+def post_changed(post, action, old_group_id=None):
+    """Пишет событие поста; old_group_id — группа до сохранения.
+
+    Клиент, который синхронизирует прежнюю группу, должен узнать, что
+    пост из неё ушёл, хотя сам пост не удалён.
+    """
+    if old_group_id is not None and old_group_id != post.group_id:
+        Change.objects.create(
+            entity=Change.POST, action=Change.LEAVE, object_id=post.pk,
+            post_id=post.pk, author_id=post.author_id, group_id=old_group_id)
+    record(Change.POST, action, post.pk, post)
+
+
+def comment_changed(comment, action):
+    # Обычно пост уже загружен вместе с комментарием
+    if Comment.post.is_cached(comment):
+        post = comment.post
+    else:
+        post = Post.objects.filter(pk=comment.post_id).only(
+            'author_id', 'group_id').first()
+    if post is not None:
+        record(Change.COMMENT, action, comment.pk, post)
+
+
+def latest():
+    """Номер последнего события: курсор клиента, который ещё ничего не ждёт."""
+    return Change.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def horizon():
+    """Номер последнего стёртого события; курсоры до него устарели."""
+    return Counter.objects.filter(name=HORIZON, object_id=0).values_list(
+        'value', flat=True).first() or 0
+
+
+def since(cursor, limit=BATCH_SIZE, author_id=None, group_id=None):
+    """Пачка событий после cursor, свёрнутая до итога по каждому объекту.
+
+    upserted и deleted — {вид объекта: [id]}. Объект, созданный и
+    удалённый внутри пачки, клиент не видел, и в пачку он не попадает.
+    Пост, ушедший из группы group_id, приходит удалённым, а его
+    комментарии клиент убирает вместе с ним.
+    """
+    events = Change.objects.filter(pk__gt=cursor)
+    if author_id is not None:
+        events = events.filter(author_id=author_id)
+    if group_id is not None:
+        events = events.filter(group_id=group_id)
+    else:
+        events = events.exclude(action=Change.LEAVE)
+    events = list(events.order_by('pk').values_list(
+        'pk', 'entity', 'action', 'object_id')[:limit + 1])
+    more = len(events) > limit
+    events = events[:limit]
+    outcome = {}
+    for _, entity, action, object_id in events:
+        if action == Change.LEAVE:
+            action = Change.DELETE
+        first = outcome.pop((entity, object_id), (action, action))[0]
+        outcome[(entity, object_id)] = (first, action)
+    upserted = {Change.POST: [], Change.COMMENT: []}
+    deleted = {Change.POST: [], Change.COMMENT: []}
+    for (entity, object_id), (first, last) in outcome.items():
+        if last != Change.DELETE:
+            upserted[entity].append(object_id)
+        elif first != Change.CREATE:
+            deleted[entity].append(object_id)
+    return Batch(
+        events[-1][0] if events else cursor, more, upserted, deleted)
+
+
+def _segments(events):
+    bounds = events.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+    for start in range(bounds['first'], bounds['last'] + 1, SEGMENT_SIZE):
+        yield start, min(start + SEGMENT_SIZE, bounds['last'] + 1)
+
+
+def compact(moment=None):
+    """Удаляет в старых сегментах события, перекрытые более новыми."""
+    cutoff = (moment or timezone.now()) - timedelta(
+        seconds=settings.CHANGES_COMPACT_AFTER)
+    newer = Change.objects.filter(
+        entity=OuterRef('entity'), object_id=OuterRef('object_id'),
+        pk__gt=OuterRef('pk'))
+    # Уход из группы нужен клиентам этой группы, пока пост в неё
+    # не вернулся, что бы с ним ни происходило в других группах
+    newer_in_group = newer.filter(group_id=OuterRef('group_id'))
+    compacted = 0
+    for start, stop in _segments(Change.objects.filter(created__lt=cutoff)):
+        superseded = Change.objects.filter(
+            pk__gte=start, pk__lt=stop).annotate(
+            newer=Exists(newer), newer_in_group=Exists(newer_in_group),
+        ).filter(
+            Q(newer=True) & ~Q(action=Change.LEAVE)
+            | Q(newer_in_group=True, action=Change.LEAVE)).values('pk')
+        with transaction.atomic():
+            compacted += Change.objects.filter(
+                pk__in=superseded).delete()[0]
+    return compacted
+
+
+def expire(moment=None):
+    """Стирает события старше срока хранения и сдвигает горизонт."""
+    cutoff = (moment or timezone.now()) - timedelta(
+        days=settings.CHANGES_RETENTION_DAYS)
+    last = Change.objects.filter(created__lt=cutoff).aggregate(
+        last=Max('pk'))['last']
+    if last is None:
+        return 0
+    with transaction.atomic():
+        Counter.objects.update_or_create(
+            name=HORIZON, object_id=0, defaults={'value': last})
+        # Стираем по номеру, а не по времени: горизонт точно
+        # отделяет стёртое от оставшегося
+        return Change.objects.filter(pk__lte=last).delete()[0]
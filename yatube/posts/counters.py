@@ -0,0 +1,110 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются сигналами в той же транзакции, что и сама запись,
+а читаются одним запросом по уникальному индексу вместо COUNT(*).
+Отсутствующий счётчик пересчитывается по таблице и сохраняется, так что
+записи в обход сигналов (bulk_create, сырой SQL) не ломают чтение;
+накопившееся расхождение исправляет команда reconcile_counters.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Comment, Counter, Follow, Post, PostTag
+
+ALL_POSTS = 'posts'
+AUTHOR_POSTS = 'author_posts'
+GROUP_POSTS = 'group_posts'
+POST_COMMENTS = 'post_comments'
+FOLLOWERS = 'followers'
+FOLLOWING = 'following'
+TAG_POSTS = 'tag_posts'
+
+# Для каждого счётчика: таблица и поле, по которому идёт подсчёт.
+# У общего числа постов поля нет, его object_id всегда 0.
+SOURCES = {
+    ALL_POSTS: (Post, None),
+    AUTHOR_POSTS: (Post, 'author_id'),
+    GROUP_POSTS: (Post, 'group_id'),
+    POST_COMMENTS: (Comment, 'post_id'),
+    FOLLOWERS: (Follow, 'author_id'),
+    FOLLOWING: (Follow, 'user_id'),
+    TAG_POSTS: (PostTag, 'tag_id'),
+}
+
+
+def recount(name, object_id):
+    model, field = SOURCES[name]
+    queryset = model.objects.all()
+    if field is not None:
+        queryset = queryset.filter(**{field: object_id})
+    return queryset.count()
+
+
+def _create(name, object_id):
+    value = recount(name, object_id)
+    try:
+        with transaction.atomic():
+            Counter.objects.create(
+                name=name, object_id=object_id, value=value)
+    except IntegrityError:
+        # Счётчик успел создать параллельный запрос — берём его значение
+        return Counter.objects.get(name=name, object_id=object_id).value
+    return value
+
+
+def get(name, object_id=0):
+    value = Counter.objects.filter(
+        name=name, object_id=object_id).values_list(
+        'value', flat=True).first()
+    if value is None:
+        return _create(name, object_id)
+    return value
+
+
+def get_many(name, object_ids):
+    """Словарь {object_id: значение} за один запрос."""
+    values = dict(Counter.objects.filter(
+        name=name, object_id__in=object_ids).values_list(
+        'object_id', 'value'))
+    for object_id in set(object_ids) - set(values):
+        values[object_id] = _create(name, object_id)
+    return values
+
+
+def incr(name, object_id=0, delta=1):
+    """Сдвигает счётчик; вызывается после записи, которую он считает."""
+    if object_id is None:
+        return
+    updated = Counter.objects.filter(
+        name=name, object_id=object_id).update(value=F('value') + delta)
+    if not updated:
+        # Пересчёт уже учитывает только что сделанную запись
+        _create(name, object_id)
+
+
+def decr(name, object_id=0):
+    incr(name, object_id, -1)
+
+
+def forget(name, object_id):
+    Counter.objects.filter(name=name, object_id=object_id).delete()
+
+
+def reconcile(name):
+    """Сверяет счётчики с таблицами, возвращает число исправленных."""
+    model, field = SOURCES[name]
+    if field is None:
+        actual = {0: model.objects.count()}
+    else:
+        actual = dict(
+            model.objects.exclude(**{field: None}).order_by().values_list(
+                field).annotate(total=Count('pk')))
+    fixed = 0
+    stored = Counter.objects.filter(name=name)
+    for counter in stored.iterator():
+        value = actual.pop(counter.object_id, 0)
+        if counter.value != value:
+            stored.filter(pk=counter.pk).update(value=value)
+            fixed += 1
+    # Недостающие счётчики создадутся при первом чтении
+    return fixed
@@ -0,0 +1,67 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+
+
+def cache_anonymous_page(feeds, newest):
+    """Кэширует всю страницу для анонимных читателей.
+
+    feeds(**kwargs) называет ленты, от поколений которых зависит
+    страница, newest(**kwargs) — дату самого свежего объекта в ней.
+    Из них собирается ETag, поэтому запрос с совпавшим If-None-Match
+    или свежим If-Modified-Since получает 304 без рендеринга, а запись
+    в любую из лент сразу меняет версию и ETag страницы. Last-Modified
+    отдаётся, только пока известно время последней записи в ленты:
+    дата свежего объекта старше правки или удаления.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            names = feeds(**kwargs)
+            latest = newest(**kwargs)
+            fingerprint = '|'.join((
+                request.get_full_path(),
+                caching.version(*names),
+                latest.isoformat() if latest else '',
+            ))
+            digest = hashlib.md5(fingerprint.encode()).hexdigest()
+            etag = quote_etag(digest)
+            changed = caching.changed_at(*names)
+            last_modified = None
+            if changed is not None:
+                last_modified = int(max(
+                    changed, latest.timestamp() if latest else 0))
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            def build():
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                # Клиент каждый раз сверяет ETag, а не доверяет своей копии
+                patch_cache_control(response, max_age=0, must_revalidate=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            # Ключ — адрес страницы, а версия — её ETag: пока один воркер
+            # рендерит новую версию, остальные отдают прежнюю
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            return caching.get_or_build(
+                f'anonymous-page:{path}', digest, build,
+                settings.PAGE_CACHE_TIMEOUT,
+                cacheable=lambda response: response.status_code == 200)
+        return wrapper
+    return decorator
@@ -0,0 +1,90 @@
+"""Подписки читателя одним компактным множеством в кэше.
+
+Для каждого читателя в кэше лежит отсортированный массив id авторов
+(array('I'), по 4 байта на подписку). Он читается один раз за запрос
+и запоминается на объекте пользователя, так что is_following_many()
+отвечает про всю страницу авторов без единого запроса к базе.
+Подписка и отписка сбрасывают массив сразу и перечитывают его после
+коммита: читатель, успевший в промежутке закэшировать старое
+множество, не оставит его надолго.
+"""
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow, Suggestion
+
+KEY_PREFIX = 'follow-set'
+TIMEOUT = 24 * 60 * 60
+TYPECODE = 'I'
+# Сколько рекомендаций «кого почитать» показывать
+SUGGESTIONS_SHOWN = 5
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def _load(user_id):
+    ids = array(TYPECODE, sorted(Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)))
+    cache.set(_key(user_id), ids.tobytes(), TIMEOUT)
+    return ids
+
+
+def followed_ids(user):
+    """Отсортированный массив id авторов, на которых подписан user."""
+    if not user.is_authenticated:
+        return array(TYPECODE)
+    ids = getattr(user, '_followed_ids', None)
+    if ids is None:
+        data = cache.get(_key(user.pk))
+        if data is None:
+            ids = _load(user.pk)
+        else:
+            ids = array(TYPECODE)
+            ids.frombytes(data)
+        user._followed_ids = ids
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following_many(user, author_ids):
+    """{id автора: подписан ли user} для всех author_ids сразу."""
+    ids = followed_ids(user)
+    return {author_id: _contains(ids, author_id) for author_id in author_ids}
+
+
+def is_following(user, author_id):
+    return is_following_many(user, [author_id])[author_id]
+
+
+def changed(user_id):
+    """Сбрасывает множество читателя; после коммита оно строится заново."""
+    cache.delete(_key(user_id))
+    transaction.on_commit(partial(_load, user_id))
+
+
+def suggestions(user, limit=SUGGESTIONS_SHOWN):
+    """Рекомендации из таблицы Suggestion, без уже прочитанных авторов.
+
+    Таблицу пересчитывает команда compute_suggestions, и с тех пор
+    читатель мог подписаться на кого-то из предложенных.
+    """
+    if not user.is_authenticated:
+        return []
+    candidates = list(Suggestion.objects.filter(user=user).select_related(
+        'author')[:limit * 2])
+    following = is_following_many(
+        user, [suggestion.author_id for suggestion in candidates])
+    return [
+        suggestion for suggestion in candidates
+        if not following[suggestion.author_id]
+    ][:limit]
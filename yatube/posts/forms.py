@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Post, Comment
 
 User = get_user_model()
@@ -11,6 +13,25 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Загрузку, отклонённую ещё при приёме (см. posts.uploads),
+        # ImageField разбирать не должен: покажем причину отказа
+        name = self.add_prefix('image')
+        self.upload_error = getattr(
+            self.files.get(name), 'upload_error', None)
+        if self.upload_error:
+            self.files = self.files.copy()
+            del self.files[name]
+
+    def clean_image(self):
+        if self.upload_error:
+            raise forms.ValidationError(self.upload_error)
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return uploads.normalize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,156 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Тексты индексируются в FTS5-таблицах с внешним содержимым
+(posts_post_fts, posts_comment_fts): сами тексты лежат в обычных
+таблицах, а индекс обновляют триггеры, поэтому в синхроне с ним
+и bulk-операции, и update() в обход сигналов. Пост находится и по своему
+тексту, и по тексту комментариев к нему; выдача ранжируется по bm25.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Скопирован в миграцию 0013_fulltext: другой токенизатор требует новой
+# миграции, пересоздающей таблицы и индекс
+TOKENIZER = 'unicode61 remove_diacritics 2'
+# Триггеры удаляются, когда миграция пересоздаёт таблицу (так SQLite
+# меняет схему), поэтому после каждой миграции они ставятся заново
+TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS {table}_fts_insert
+    AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {table}_fts_delete
+    AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {table}_fts_update
+    AFTER UPDATE OF text ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+TABLES = ('posts_post', 'posts_comment')
+
+MAX_RESULTS = 1000
+# Совпадение в комментарии весит меньше совпадения в самом посте;
+# bm25 отрицателен, и чем меньше, тем лучше
+COMMENT_WEIGHT = 0.5
+SNIPPET_TOKENS = 16
+# Маркеры совпадений в snippet(): управляющие символы не встречаются
+# в тексте и переживают экранирование HTML
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+FIND = f'''
+SELECT post_id, MIN(rank) AS best FROM (
+    SELECT rowid AS post_id, bm25(posts_post_fts) AS rank
+    FROM posts_post_fts WHERE posts_post_fts MATCH %s
+    UNION ALL
+    SELECT comment.post_id, bm25(posts_comment_fts) * {COMMENT_WEIGHT}
+    FROM posts_comment_fts
+    JOIN posts_comment AS comment ON comment.id = posts_comment_fts.rowid
+    WHERE posts_comment_fts MATCH %s
+)
+GROUP BY post_id ORDER BY best, post_id DESC LIMIT %s
+'''
+
+
+def install_triggers(**kwargs):
+    """Ставит недостающие триггеры индекса (обработчик post_migrate)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table in TABLES:
+            if table in existing and f'{table}_fts' in existing:
+                for trigger in TRIGGERS:
+                    cursor.execute(trigger.format(table=table))
+
+
+def match_expression(query):
+    """Безопасное выражение MATCH: все слова запроса, последнее — префикс.
+
+    Каждое слово берётся в кавычки, поэтому синтаксис FTS5 (NEAR, OR,
+    двоеточия) из пользовательского ввода не интерпретируется.
+    """
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def find(query, limit=MAX_RESULTS):
+    """id постов по убыванию релевантности, не больше limit."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(FIND, [expression, expression, limit])
+        return [post_id for post_id, _ in cursor.fetchall()]
+
+
+def matching_posts(query):
+    """Условие для filter(pk__in=...): посты, чей текст совпал с запросом."""
+    expression = match_expression(query) or '""'
+    return RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        [expression])
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def snippets(post_ids, query):
+    """{id поста: фрагмент с подсветкой} для страницы выдачи.
+
+    Если пост нашёлся только по комментарию, фрагмент берётся из
+    самого релевантного комментария.
+    """
+    expression = match_expression(query)
+    post_ids = list(post_ids)
+    if expression is None or not post_ids:
+        return {}
+    marks = ','.join(['%s'] * len(post_ids))
+    snippet = (f"snippet({{table}}, 0, '{MARK_START}', '{MARK_END}', "
+               f"'…', {SNIPPET_TOKENS})")
+    found = {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT comment.post_id, '
+            f'{snippet.format(table="posts_comment_fts")} '
+            f'FROM posts_comment_fts '
+            f'JOIN posts_comment AS comment '
+            f'ON comment.id = posts_comment_fts.rowid '
+            f'WHERE posts_comment_fts MATCH %s AND comment.post_id IN '
+            f'({marks}) ORDER BY bm25(posts_comment_fts) DESC',
+            [expression, *post_ids])
+        # Сортировка от худшего к лучшему: лучший фрагмент пишется последним
+        found.update(cursor.fetchall())
+        cursor.execute(
+            f'SELECT rowid, {snippet.format(table="posts_post_fts")} '
+            f'FROM posts_post_fts WHERE posts_post_fts MATCH %s '
+            f'AND rowid IN ({marks})',
+            [expression, *post_ids])
+        found.update(cursor.fetchall())
+    return {post_id: _highlight(text) for post_id, text in found.items()}
+
+
+def rebuild():
+    """Перестраивает индексы целиком по содержимому таблиц."""
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(
+                f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+            cursor.execute(
+                f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')")
@@ -0,0 +1,173 @@
+"""Хештеги постов: инвертированный индекс и почасовые итоги для трендов.
+
+При сохранении поста теги из текста раскладываются по строкам PostTag
+с датой поста, поэтому лента /tag/<name>/ — это диапазон по индексу
+(tag, pub_date, post). Число постов с тегом за каждый час копится
+в TagRollup в той же транзакции, и тренды суммируют десятки строк
+итогов вместо подсчёта по всем постам. Для постов, написанных
+до появления тегов, индекс строит команда backfill_hashtags.
+"""
+import re
+from collections import defaultdict
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import caching, counters
+from .models import Post, PostTag, Tag, TagRollup
+from .paginators import POSTS_PER_PAGE, MergedCursorPaginator, get_page
+
+# Тег — слово после решётки, которая не продолжает другое слово:
+# иначе тегами стали бы якорь в page#top и мнемоника &#39;
+TAG_RE = re.compile(r'(?<![\w#&])#(\w+)')
+MAX_LENGTH = Tag._meta.get_field('name').max_length
+BATCH_SIZE = 500
+TAG_FEED_ORDERING = ('-pub_date', '-post_id')
+
+
+def extract(text):
+    """Множество тегов текста в нижнем регистре."""
+    return {
+        name.lower() for name in TAG_RE.findall(text)
+        if len(name) <= MAX_LENGTH
+    }
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _tag_ids(names):
+    """{имя: id} тегов, недостающие создаются."""
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def _shift_rollup(tag_id, hour, delta):
+    updated = TagRollup.objects.filter(tag_id=tag_id, hour=hour).update(
+        count=F('count') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TagRollup.objects.create(tag_id=tag_id, hour=hour, count=delta)
+    except IntegrityError:
+        # Итог успел создать параллельный запрос
+        TagRollup.objects.filter(tag_id=tag_id, hour=hour).update(
+            count=F('count') + delta)
+
+
+def _apply(added, removed):
+    """Переносит изменения индекса в счётчики и итоги.
+
+    added и removed — пары (id тега, дата поста). Итоги ведутся только
+    за окно TAG_ROLLUP_HOURS: старые посты на тренды уже не влияют.
+    """
+    posts = defaultdict(int)
+    rollups = defaultdict(int)
+    since = hour_of(timezone.now()) - timedelta(
+        hours=settings.TAG_ROLLUP_HOURS)
+    for pairs, sign in ((added, 1), (removed, -1)):
+        for tag_id, pub_date in pairs:
+            posts[tag_id] += sign
+            hour = hour_of(pub_date)
+            if hour >= since:
+                rollups[tag_id, hour] += sign
+    for tag_id, delta in posts.items():
+        if delta:
+            counters.incr(counters.TAG_POSTS, tag_id, delta)
+    for (tag_id, hour), delta in rollups.items():
+        if delta:
+            _shift_rollup(tag_id, hour, delta)
+
+
+def index_posts(posts):
+    """Приводит индекс тегов пачки постов в соответствие с их текстом.
+
+    Повторный вызов ничего не меняет, поэтому его можно делать
+    и при каждом сохранении, и при дозаполнении. Возвращает имена
+    тегов, чьи ленты задеты: и прежние, и новые.
+    """
+    posts = {post.pk: post for post in posts}
+    wanted = {pk: extract(post.text) for pk, post in posts.items()}
+    stored = {}
+    for post_id, name in PostTag.objects.filter(
+            post_id__in=posts).values_list('post_id', 'tag__name'):
+        stored.setdefault(post_id, set()).add(name)
+    tag_ids = _tag_ids(set().union(*wanted.values()))
+    added = []
+    removed_names = {}
+    for pk, post in posts.items():
+        old = stored.get(pk, set())
+        added += [
+            PostTag(tag_id=tag_ids[name], post_id=pk, pub_date=post.pub_date)
+            for name in wanted[pk] - old
+        ]
+        for name in old - wanted[pk]:
+            removed_names.setdefault(name, []).append(pk)
+    stale = []
+    if removed_names:
+        stale = [
+            (pk, tag_id, pub_date) for pk, tag_id, post_id, pub_date, name in
+            PostTag.objects.filter(
+                tag__name__in=removed_names, post_id__in=posts).values_list(
+                'pk', 'tag_id', 'post_id', 'pub_date', 'tag__name')
+            if post_id in removed_names[name]
+        ]
+        PostTag.objects.filter(pk__in=[pk for pk, _, _ in stale]).delete()
+    PostTag.objects.bulk_create(added, batch_size=BATCH_SIZE)
+    _apply(
+        [(entry.tag_id, entry.pub_date) for entry in added],
+        [(tag_id, pub_date) for _, tag_id, pub_date in stale])
+    return set().union(*stored.values(), *wanted.values())
+
+
+def unindex_post(post):
+    """Снимает пост с итогов перед удалением; строки удалит каскад."""
+    entries = list(PostTag.objects.filter(post=post).values_list(
+        'tag_id', 'pub_date', 'tag__name'))
+    _apply([], [(tag_id, pub_date) for tag_id, pub_date, _ in entries])
+    return {name for _, _, name in entries}
+
+
+def invalidate(names):
+    caching.bump(*map(caching.tag_feed, names))
+
+
+def tag_page(request, tag):
+    """Страница ленты тега: keyset по индексу (tag, pub_date, post)."""
+    entries = PostTag.objects.filter(tag=tag).select_related(
+        'post__author', 'post__group')
+    # Нумерованный режим ?page= читает ленту через join с постами
+    fallback = Post.objects.filter(post_tags__tag=tag).select_related(
+        'author', 'group')
+    return get_page(request, MergedCursorPaginator(
+        [(entries, TAG_FEED_ORDERING, attrgetter('post'))],
+        POSTS_PER_PAGE, fallback,
+        count=lambda: counters.get(counters.TAG_POSTS, tag.pk)))
+
+
+def trending(hours=24, limit=10):
+    """[(имя, число постов)] самых частых тегов за последние часы.
+
+    Итоги хранятся за TAG_ROLLUP_HOURS, окно длиннее не посчитать.
+    """
+    hours = min(hours, settings.TAG_ROLLUP_HOURS)
+    since = hour_of(timezone.now()) - timedelta(hours=hours - 1)
+    return list(
+        TagRollup.objects.filter(hour__gte=since).values_list(
+            'tag__name').annotate(total=Sum('count')).filter(
+            total__gt=0).order_by('-total', 'tag__name')[:limit])
+
+
+def prune():
+    """Удаляет итоги старше окна TAG_ROLLUP_HOURS."""
+    since = hour_of(timezone.now()) - timedelta(
+        hours=settings.TAG_ROLLUP_HOURS)
+    return TagRollup.objects.filter(hour__lt=since).delete()[0]
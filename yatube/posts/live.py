@@ -0,0 +1,241 @@
+"""Поток Server-Sent Events «N новых постов» для ленты подписок.
+
+Сервер — asyncio-сайдкар рядом с WSGI-приложением (yatube/sse.py).
+Соединение — это сокет, строка в индексе «автор → соединения» и задача,
+которая просто ждёт обрыва; таймеров и запросов к базе у него нет.
+Новые посты читает один общий цикл watch(): раз в LIVE_POLL_INTERVAL
+он берёт события журнала изменений (posts.changes) после своего курсора
+и раскладывает их по индексу, так что число запросов к базе не зависит
+от числа подписчиков. Раз в LIVE_HEARTBEAT всем уходит комментарий-пинг: прокси
+не закрывают молчащие соединения, а оборванные находятся при записи.
+
+Множество авторов читается при подключении; после подписки оно
+обновится при следующем переподключении, например при обновлении
+страницы.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import DatabaseError, close_old_connections
+
+from . import changes, follows
+from .models import Change
+
+logger = logging.getLogger(__name__)
+
+EVENT = 'new-posts'
+PATH = '/events/'
+# Сколько событий журнала читается за один опрос
+BATCH_SIZE = 1000
+# Соединение, которое не успевает читать, закрывается
+MAX_BUFFER = 64 * 1024
+# Через сколько миллисекунд браузер переподключится после обрыва
+RETRY = 10000
+HEADERS = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Type: text/event-stream\r\n'
+    'Cache-Control: no-cache\r\n'
+    'Connection: keep-alive\r\n'
+    # Буферизующий прокси (nginx) иначе копил бы события
+    'X-Accel-Buffering: no\r\n'
+    '\r\n'
+)
+
+# ORM синхронный: все запросы идут в одном потоке со своим соединением
+_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _run(func, *args):
+    close_old_connections()
+    return func(*args)
+
+
+async def db(func, *args):
+    """Выполняет func(*args) в потоке базы, не блокируя цикл событий."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, _run, func, *args)
+
+
+class Connection:
+    def __init__(self, writer, user_id, authors):
+        self.writer = writer
+        self.user_id = user_id
+        self.authors = authors
+        self.count = 0
+        self.closed = False
+
+    def send(self, chunk):
+        """Пишет в сокет без ожидания; False, если соединение пора снять."""
+        if self.closed or self.writer.is_closing():
+            return False
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() > MAX_BUFFER:
+            return False
+        self.writer.write(chunk.encode())
+        return True
+
+    def close(self):
+        self.closed = True
+        self.writer.close()
+
+
+class Hub:
+    """Индекс «автор → соединения его подписчиков»."""
+
+    def __init__(self):
+        self.connections = set()
+        self.by_author = defaultdict(set)
+
+    def add(self, connection):
+        self.connections.add(connection)
+        for author_id in connection.authors:
+            self.by_author[author_id].add(connection)
+
+    def remove(self, connection):
+        self.connections.discard(connection)
+        for author_id in connection.authors:
+            readers = self.by_author.get(author_id)
+            if readers is not None:
+                readers.discard(connection)
+                if not readers:
+                    del self.by_author[author_id]
+
+    def _send(self, connection, chunk):
+        if not connection.send(chunk):
+            self.remove(connection)
+            connection.close()
+
+    def publish(self, author_ids):
+        """Сообщает каждому подписчику, сколько у него новых постов.
+
+        author_ids — авторы новых постов за опрос, с повторами. Читатель
+        получает одно событие на опрос, сколько бы постов ни вышло.
+        """
+        new = defaultdict(int)
+        for author_id in author_ids:
+            for connection in self.by_author.get(author_id, ()):
+                new[connection] += 1
+        for connection, count in new.items():
+            connection.count += count
+            data = json.dumps({'count': connection.count})
+            self._send(connection, f'event: {EVENT}\ndata: {data}\n\n')
+        return len(new)
+
+    def ping(self):
+        for connection in list(self.connections):
+            self._send(connection, ': ping\n\n')
+
+
+def new_posts(cursor):
+    """(новый курсор, авторы постов, опубликованных после cursor)."""
+    events = list(Change.objects.filter(pk__gt=cursor).order_by(
+        'pk').values_list('pk', 'entity', 'action', 'author_id')[
+        :BATCH_SIZE])
+    if not events:
+        return cursor, []
+    return events[-1][0], [
+        author_id for _, entity, action, author_id in events
+        if entity == Change.POST and action == Change.CREATE
+    ]
+
+
+def identify(session_key):
+    """(id читателя, множество его авторов) по ключу сессии или None."""
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(
+        session=engine.SessionStore(session_key)))
+    if not user.is_authenticated:
+        return None
+    return user.pk, set(follows.followed_ids(user))
+
+
+async def watch(hub, interval=None, cursor=None):
+    """Общий цикл: опрос журнала и раскладка новых постов по индексу."""
+    interval = interval or settings.LIVE_POLL_INTERVAL
+    if cursor is None:
+        cursor = await db(changes.latest)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            cursor, authors = await db(new_posts, cursor)
+        except DatabaseError:
+            # База недоступна: соединения живут, опрос повторится
+            logger.exception('Change log poll failed')
+            continue
+        hub.publish(authors)
+
+
+async def heartbeat(hub, interval=None):
+    interval = interval or settings.LIVE_HEARTBEAT
+    while True:
+        await asyncio.sleep(interval)
+        hub.ping()
+
+
+async def _read_request(stream):
+    """Путь и cookie из запроса; тело у GET не читается."""
+    request_line = await stream.readline()
+    parts = request_line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await stream.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    method, path = (parts + ['', ''])[:2]
+    return method, path.split('?')[0], headers.get('cookie', '')
+
+
+def _error(writer, status):
+    writer.write(
+        f'HTTP/1.1 {status}\r\nContent-Length: 0\r\n'
+        f'Connection: close\r\n\r\n'.encode())
+    writer.close()
+
+
+def handler(hub):
+    """Обработчик соединений asyncio.start_server для этого хаба."""
+    async def handle(stream, writer):
+        try:
+            method, path, cookie = await asyncio.wait_for(
+                _read_request(stream), timeout=10)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            writer.close()
+            return
+        if method != 'GET' or path != PATH:
+            return _error(writer, '404 Not Found')
+        morsel = SimpleCookie(cookie).get(settings.SESSION_COOKIE_NAME)
+        found = await db(identify, morsel.value) if morsel else None
+        if found is None:
+            return _error(writer, '401 Unauthorized')
+        connection = Connection(writer, *found)
+        writer.write(HEADERS.encode())
+        writer.write(f'retry: {RETRY}\n\n'.encode())
+        hub.add(connection)
+        try:
+            # Клиент ничего не присылает: чтение вернёт пустоту при обрыве
+            while await stream.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            hub.remove(connection)
+            connection.close()
+    return handle
+
+
+async def serve(host, port):
+    hub = Hub()
+    server = await asyncio.start_server(handler(hub), host, port)
+    async with server:
+        await asyncio.gather(
+            server.serve_forever(), watch(hub), heartbeat(hub))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import hashtags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит индекс хештегов для уже написанных постов; '
+            'повторный запуск только досинхронизирует его.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов разбирать в одной транзакции.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by('pk').only('pk', 'text', 'pub_date')
+        last_pk = 0
+        indexed = 0
+        while True:
+            # Пачки идут по первичному ключу, без OFFSET: каждая
+            # читается по индексу, как бы далеко ни ушёл проход
+            batch = list(posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                hashtags.invalidate(hashtags.index_posts(batch))
+            last_pk = batch[-1].pk
+            indexed += len(batch)
+            self.stdout.write(f'Разобрано постов: {indexed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс хештегов построен, постов: {indexed}'))
@@ -0,0 +1,108 @@
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import string
+import tempfile
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import fulltext
+
+BATCH_SIZE = 10000
+VOCABULARY_SIZE = 50000
+WORDS_PER_POST = (5, 40)
+
+
+def make_vocabulary(generator):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(generator.choices(
+            string.ascii_lowercase, k=generator.randint(4, 10))))
+    return list(words)
+
+
+def timed(db, sql, params, repeat=3):
+    """Медианное время запроса, мс."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск через индекс FTS5 и через LIKE на '
+            'синтетической таблице постов в отдельном файле SQLite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        vocabulary = make_vocabulary(generator)
+        # Частоты слов убывают как в естественном языке (закон Ципфа),
+        # choices() получает их уже накопленными
+        weights = list(itertools.accumulate(
+            1 / rank for rank in range(1, len(vocabulary) + 1)))
+        directory = tempfile.mkdtemp()
+        try:
+            db = sqlite3.connect(os.path.join(directory, 'search.sqlite3'))
+            self.fill(db, generator, vocabulary, weights, options['rows'])
+            words = generator.sample(vocabulary[100:5000], options['queries'])
+            self.compare(db, words)
+            db.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def fill(self, db, generator, vocabulary, weights, rows):
+        db.execute(
+            'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT NOT NULL)')
+        started = time.perf_counter()
+        for start in range(0, rows, BATCH_SIZE):
+            batch = []
+            for _ in range(min(BATCH_SIZE, rows - start)):
+                size = generator.randint(*WORDS_PER_POST)
+                words = generator.choices(
+                    vocabulary, cum_weights=weights, k=size)
+                batch.append((' '.join(words),))
+            db.executemany('INSERT INTO post (text) VALUES (?)', batch)
+        db.commit()
+        self.stdout.write(
+            f'{rows} строк записано за {time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        db.execute(
+            f"CREATE VIRTUAL TABLE post_fts USING fts5(text, content='post', "
+            f"content_rowid='id', tokenize='{fulltext.TOKENIZER}')")
+        db.execute("INSERT INTO post_fts (post_fts) VALUES ('rebuild')")
+        db.commit()
+        self.stdout.write(
+            f'Индекс FTS5 построен за {time.perf_counter() - started:.1f} с')
+
+    def compare(self, db, words):
+        queries = {
+            'LIKE, первые 10': (
+                'SELECT id FROM post WHERE text LIKE ? '
+                'ORDER BY id DESC LIMIT 10', lambda word: [f'%{word}%']),
+            'LIKE, всего найдено': (
+                'SELECT COUNT(*) FROM post WHERE text LIKE ?',
+                lambda word: [f'%{word}%']),
+            'FTS5, первые 10 по bm25': (
+                'SELECT rowid FROM post_fts WHERE post_fts MATCH ? '
+                'ORDER BY bm25(post_fts) LIMIT 10',
+                lambda word: [f'"{word}"']),
+            'FTS5, всего найдено': (
+                'SELECT COUNT(*) FROM post_fts WHERE post_fts MATCH ?',
+                lambda word: [f'"{word}"']),
+        }
+        for title, (sql, params) in queries.items():
+            timings = [timed(db, sql, params(word)) for word in words]
+            self.stdout.write(
+                f'{title:>24}: медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс')
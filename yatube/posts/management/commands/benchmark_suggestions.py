@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = ('Считает рекомендации на синтетическом графе подписок в памяти, '
+            'без базы, и сообщает время и пиковую память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500000)
+        parser.add_argument('--edges', type=int, default=5000000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--block-size', type=int, default=recommendations.BLOCK_SIZE)
+        parser.add_argument(
+            '--hub-limit', type=int, default=recommendations.HUB_LIMIT)
+
+    def handle(self, *args, **options):
+        generator = np.random.default_rng(options['seed'])
+        users, edges = options['users'], options['edges']
+        # Популярность авторов распределена по степенному закону:
+        # немногие авторы собирают большую часть подписок
+        followers = generator.integers(0, users, edges)
+        authors = (generator.zipf(1.5, edges) - 1) % users
+        # Номера авторов перемешаны, чтобы хабы не шли подряд
+        authors = generator.permutation(users)[authors]
+        started = time.perf_counter()
+        nodes, matrix = recommendations.build_matrix(followers, authors)
+        self.stdout.write(
+            f'Граф: {len(nodes)} пользователей, {matrix.nnz} подписок, '
+            f'матрица {recommendations.matrix_bytes(matrix) / MB:.1f} МБ, '
+            f'построен за {time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        suggested = 0
+        for _, _, rows, _, _, _ in recommendations.suggest(
+                matrix, block_size=options['block_size'],
+                hub_limit=options['hub_limit']):
+            suggested += len(rows)
+        self.stdout.write(
+            f'Рекомендаций: {suggested}, посчитаны за '
+            f'{time.perf_counter() - started:.1f} с')
+        self.stdout.write(
+            f'Пиковая память процесса: '
+            f'{recommendations.peak_memory() / MB:.0f} МБ')
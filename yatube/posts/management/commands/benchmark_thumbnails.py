@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import thumbnails
+from posts.models import Post
+from posts.paginators import POSTS_PER_PAGE
+
+
+def resolve(posts, batched):
+    """Разрешает миниатюры страницы, как это делают её {% thumbnail %}."""
+    if batched:
+        thumbnails.prefetch(post.image for post in posts)
+    for post in posts:
+        for geometry, options in thumbnails.GEOMETRIES:
+            default.backend.get_ready(post.image, geometry, **options)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает число запросов к базе на разрешение миниатюр '
+            'страницы ленты: по одному на тег и пачкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=POSTS_PER_PAGE,
+            help='Сколько постов с картинками на странице.')
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.exclude(image='')[:options['posts']])
+        if not posts:
+            self.stdout.write('Нет постов с картинками')
+            return
+        store = default.kvstore
+        keys = [
+            add_prefix(default.backend.thumbnail_file(
+                post.image, geometry, **geometry_options).key)
+            for post in posts
+            for geometry, geometry_options in thumbnails.GEOMETRIES
+        ]
+        self.stdout.write(f'{len(posts)} постов, {len(keys)} миниатюр')
+        scenarios = (
+            ('по тегу, холодный кэш', False, True, True),
+            ('по тегу, тёплый кэш', False, False, True),
+            ('пачкой, холодный кэш', True, True, True),
+            ('пачкой, тёплый кэш', True, False, True),
+            ('пачкой, LRU процесса', True, False, False),
+        )
+        for title, batched, cold, forget in scenarios:
+            if cold:
+                store.cache.delete_many(keys)
+            if forget:
+                store.lru.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                resolve(posts, batched)
+                elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'{title:>24}: запросов {len(queries)}, {elapsed:.1f} ms')
@@ -0,0 +1,80 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts import trending
+from posts.models import Post, PostScore
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет поток событий через рейтинг популярного и меряет '
+            'запись и чтение вершины. Всё происходит в транзакции, '
+            'которая откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--events', type=int, default=100000)
+        parser.add_argument(
+            '--rate', type=float, default=1000,
+            help='Событий в секунду модельного времени.')
+        parser.add_argument('--reads', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        # Посты существуют только как id: внешний ключ в SQLite
+        # проверяется при коммите, а до него дело не дойдёт
+        first = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        ids = range(first, first + options['posts'])
+        # Популярность постов распределена по Ципфу
+        weights = [1 / rank for rank in range(1, len(ids) + 1)]
+        events = generator.choices(ids, weights, k=options['events'])
+        step = timedelta(seconds=1 / options['rate'])
+        moment = trending._now()
+        try:
+            with transaction.atomic():
+                self.run(events, step, moment, options['reads'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, events, step, moment, reads):
+        probability = trending.PRUNE_PROBABILITY
+        # Подрезку меряем отдельно
+        trending.PRUNE_PROBABILITY = 0
+        try:
+            started = time.perf_counter()
+            for post_id in events:
+                moment += step
+                trending.record(post_id, trending.COMMENT_WEIGHT, moment)
+            elapsed = time.perf_counter() - started
+        finally:
+            trending.PRUNE_PROBABILITY = probability
+        self.stdout.write(
+            f'Запись: {len(events)} событий за {elapsed:.1f} с, '
+            f'{elapsed / len(events) * 1e6:.0f} мкс на событие, '
+            f'{len(events) / elapsed:.0f} событий/с; '
+            f'оценок в таблице {PostScore.objects.count()}')
+        top = PostScore.objects.order_by('-score').values_list(
+            'post_id', 'score')
+        started = time.perf_counter()
+        for _ in range(reads):
+            leaders = list(top[:trending.SHOWN])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Чтение вершины из {trending.SHOWN}: '
+            f'{elapsed / reads * 1000:.2f} мс; лидер {leaders[0][0]} '
+            f'с оценкой {trending.current(leaders[0][1], moment):.1f}')
+        started = time.perf_counter()
+        pruned = trending.prune(moment=moment)
+        self.stdout.write(
+            f'Подрезка до {trending.CAPACITY}: удалено {pruned} за '
+            f'{(time.perf_counter() - started) * 1000:.0f} мс')
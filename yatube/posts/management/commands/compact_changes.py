@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import changes
+
+
+class Command(BaseCommand):
+    help = ('Сворачивает старые сегменты журнала изменений и стирает '
+            'события старше CHANGES_RETENTION_DAYS.')
+
+    def handle(self, *args, **options):
+        compacted = changes.compact()
+        expired = changes.expire()
+        self.stdout.write(
+            f'Свёрнуто событий: {compacted}, стёрто: {expired}, '
+            f'горизонт: {changes.horizon()}')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого почитать» по графу подписок '
+            'и сообщает время и расход памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=recommendations.TOP)
+        parser.add_argument(
+            '--block-size', type=int, default=recommendations.BLOCK_SIZE,
+            help='Сколько читателей обсчитывать за одно умножение.')
+        parser.add_argument(
+            '--hub-limit', type=int, default=recommendations.HUB_LIMIT,
+            help='Авторы с большим числом подписчиков не участвуют '
+                 'в совместных подписках.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        nodes, matrix = recommendations.load_graph()
+        self.stdout.write(
+            f'Граф: {len(nodes)} пользователей, {matrix.nnz} подписок, '
+            f'матрица {recommendations.matrix_bytes(matrix) / MB:.1f} МБ, '
+            f'загружен за {time.perf_counter() - started:.1f} с')
+        stored = 0
+        for block in recommendations.suggest(
+                matrix, options['top'], options['block_size'],
+                options['hub_limit']):
+            stored += recommendations.store(nodes, *block)
+        dropped = recommendations.drop_orphans()
+        self.stdout.write(
+            f'Пиковая память процесса: '
+            f'{recommendations.peak_memory() / MB:.0f} МБ')
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано рекомендаций: {stored}, удалено устаревших: '
+            f'{dropped}, всего {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exports
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты и комментарии авторов в файлы '
+            '<имя>.ndjson или <имя>.zip; без имён — всех авторов с постами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+        parser.add_argument(
+            '--format', choices=sorted(exports.FORMATS), default='ndjson')
+        parser.add_argument('--output', default='.')
+
+    def handle(self, *args, **options):
+        extension = options['format']
+        export = exports.FORMATS[extension][0]
+        os.makedirs(options['output'], exist_ok=True)
+        authors = User.objects.order_by('pk')
+        if options['usernames']:
+            authors = authors.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(
+                authors.values_list('username', flat=True))
+            if missing:
+                raise CommandError(
+                    f'Нет авторов: {", ".join(sorted(missing))}')
+        else:
+            authors = authors.filter(
+                pk__in=Post.objects.values('author_id'))
+        done = 0
+        for author in authors.iterator():
+            path = os.path.join(
+                options['output'], f'{author.username}.{extension}')
+            # Файл появляется под своим именем только целиком
+            with open(path + '.part', 'wb') as output:
+                for chunk in export(author):
+                    output.write(chunk)
+            os.replace(path + '.part', path)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Выгружено авторов: {done}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Рисует миниатюры постов, загруженных до появления очереди, '
+            'чтобы вместо них не показывалась заглушка.')
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').values_list(
+            'pk', flat=True)
+        done = 0
+        for post_id in post_ids.iterator():
+            thumbnails.generate(post_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
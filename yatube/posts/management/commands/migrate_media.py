@@ -0,0 +1,60 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import is_hashed
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище по хешу содержимого '
+            'и переписывает пути в Post.image.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов читать из базы за раз.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, что будет перенесено.')
+
+    def exists(self, storage, name):
+        try:
+            return storage.exists(name)
+        except SuspiciousFileOperation:
+            # Путь вне MEDIA_ROOT: такой файл хранилищу не принадлежит
+            return False
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        if not hasattr(storage, 'release'):
+            raise CommandError(
+                'Post.image хранится не в ContentAddressedStorage')
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        moved = missing = 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            old_name = post.image.name
+            if is_hashed(old_name):
+                continue
+            if not self.exists(storage, old_name):
+                missing += 1
+                self.stderr.write(f'Пост {post.pk}: нет файла {old_name}')
+                continue
+            moved += 1
+            if options['dry_run']:
+                continue
+            with storage.open(old_name, 'rb') as source:
+                new_name = storage.save(old_name, source)
+            with transaction.atomic():
+                Post.objects.filter(pk=post.pk).update(image=new_name)
+            # Старый файл хранилище не учитывает, поэтому delete()
+            # удаляет его сразу, как только на него не ссылается ни один пост
+            if not Post.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+            # Имя миниатюр sorl зависит от имени исходного файла
+            if not post.image_variants.exists():
+                thumbnails.generate(post.pk)
+        verb = 'Будет перенесено' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {moved}, без файла: {missing}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        fulltext.install_triggers()
+        with transaction.atomic():
+            fulltext.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с таблицами и чинит их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Сверить только эти счётчики: '
+                 + ', '.join(sorted(counters.SOURCES)))
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(counters.SOURCES)
+        if unknown:
+            raise CommandError(
+                'Неизвестные счётчики: ' + ', '.join(sorted(unknown)))
+        for name in options['names'] or sorted(counters.SOURCES):
+            with transaction.atomic():
+                fixed = counters.reconcile(name)
+            self.stdout.write(f'{name}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
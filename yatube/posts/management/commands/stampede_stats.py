@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько пересборок кэша лент удалось схлопнуть.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = caching.stampede_stats()
+        for event in caching.EVENTS:
+            self.stdout.write(f'{event}: {stats[event]}')
+        if options['reset']:
+            caching.reset_stampede_stats()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые популярные посты по затухающей оценке.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=trending.SHOWN)
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить затухшие оценки и всё ниже CAPACITY лучших.')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            pruned = trending.prune()
+            self.stdout.write(f'Удалено оценок: {pruned}')
+        for post in trending.top(options['limit']):
+            self.stdout.write(f'{post.pk}: {post.heat:.2f}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import hashtags
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые частые теги по почасовым итогам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить итоги старше TAG_ROLLUP_HOURS.')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            pruned = hashtags.prune()
+            self.stdout.write(f'Удалено старых итогов: {pruned}')
+        for name, total in hashtags.trending(
+                options['hours'], options['limit']):
+            self.stdout.write(f'#{name}: {total}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timelines
+
+# Столько лент обрезается одним запросом
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = ('Обрезает ленты подписок до TIMELINE_MAX_LENGTH записей. '
+            'Публикация ленты не обрезает, команду запускают по расписанию.')
+
+    def handle(self, *args, **options):
+        user_ids = list(timelines.overfull())
+        removed = 0
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            with transaction.atomic():
+                removed += timelines.trim_many(
+                    user_ids[start:start + BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обрезано лент: {len(user_ids)}, удалено записей: {removed}'))
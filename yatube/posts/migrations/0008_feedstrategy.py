@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedStrategy',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_strategy', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('strategy', models.CharField(choices=[('push', 'Раскладывать по лентам при публикации'), ('pull', 'Подмешивать в ленты при чтении')], db_index=True, default='push', max_length=4, verbose_name='Стратегия')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('changed', models.DateTimeField(auto_now_add=True, verbose_name='Стратегия изменена')),
+            ],
+            options={
+                'verbose_name': 'Feed strategy',
+            },
+        ),
+    ]
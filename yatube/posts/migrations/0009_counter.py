@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feedstrategy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, verbose_name='Счётчик')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объект')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Counter',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='counter',
+            constraint=models.UniqueConstraint(fields=('name', 'object_id'), name='counter_name_object'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# Намеренная копия posts.fulltext.TOKENIZER на момент миграции:
+# миграция не должна меняться вместе с кодом
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+
+def operations(table):
+    return [
+        migrations.RunSQL(
+            f"CREATE VIRTUAL TABLE {table}_fts USING fts5("
+            f"text, content='{table}', content_rowid='id', "
+            f"tokenize='{TOKENIZER}')",
+            f'DROP TABLE {table}_fts',
+        ),
+        migrations.RunSQL(
+            f'''CREATE TRIGGER {table}_fts_insert
+            AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, text)
+                VALUES (new.id, new.text);
+            END''',
+            f'DROP TRIGGER {table}_fts_insert',
+        ),
+        migrations.RunSQL(
+            f'''CREATE TRIGGER {table}_fts_delete
+            AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, text)
+                VALUES ('delete', old.id, old.text);
+            END''',
+            f'DROP TRIGGER {table}_fts_delete',
+        ),
+        migrations.RunSQL(
+            f'''CREATE TRIGGER {table}_fts_update
+            AFTER UPDATE OF text ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, text)
+                VALUES ('delete', old.id, old.text);
+                INSERT INTO {table}_fts (rowid, text)
+                VALUES (new.id, new.text);
+            END''',
+            f'DROP TRIGGER {table}_fts_update',
+        ),
+        migrations.RunSQL(
+            f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')",
+            migrations.RunSQL.noop,
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_storedblob'),
+    ]
+
+    operations = operations('posts_post') + operations('posts_comment')
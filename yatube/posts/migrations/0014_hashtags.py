@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Tag',
+            },
+        ),
+        migrations.CreateModel(
+            name='TagRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('count', models.IntegerField(default=0, verbose_name='Постов')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='posts.Tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Tag rollup',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post', verbose_name='Пост')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Post tag',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagrollup',
+            index=models.Index(fields=['hour'], name='tag_rollup_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagrollup',
+            constraint=models.UniqueConstraint(fields=('tag', 'hour'), name='tag_rollup_tag_hour'),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='post_tag_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='post_tag_tag_post'),
+        ),
+    ]
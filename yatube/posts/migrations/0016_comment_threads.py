@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:45
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def fill_paths(apps, schema_editor):
+    # Все прежние комментарии — корни; сегмент пути как в posts.threads
+    Comment = apps.get_model('posts', 'Comment')
+    for comment in Comment.objects.only('pk', 'pub_date').iterator():
+        micros = (comment.pub_date - EPOCH) // timedelta(microseconds=1)
+        Comment.objects.filter(pk=comment.pk).update(
+            path=f'{micros:014x}{comment.pk:010x}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_feed_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Глубина'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='descendants',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ответов в ветке'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Путь'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', 'path'], name='comment_root_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+    ]
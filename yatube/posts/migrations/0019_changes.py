@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=7, verbose_name='Объект')),
+                ('action', models.CharField(choices=[('create', 'Создан'), ('update', 'Изменён'), ('delete', 'Удалён')], max_length=6, verbose_name='Действие')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('post_id', models.PositiveIntegerField(verbose_name='id поста')),
+                ('author_id', models.PositiveIntegerField(verbose_name='id автора поста')),
+                ('group_id', models.PositiveIntegerField(null=True, verbose_name='id группы')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['entity', 'object_id', 'id'], name='change_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['author_id', 'id'], name='change_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['group_id', 'id'], name='change_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['created'], name='change_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='change',
+            name='action',
+            field=models.CharField(choices=[('create', 'Создан'), ('update', 'Изменён'), ('delete', 'Удалён'), ('leave', 'Ушёл из группы')], max_length=6, verbose_name='Действие'),
+        ),
+    ]
@@ -37,6 +37,11 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    # Меняется при каждом сохранении: входит в ключ кэша карточки поста
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -62,7 +67,18 @@ class Post(models.Model):
 
     class Meta:
         verbose_name = 'Post'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # Индексы под keyset-пагинацию лент по (pub_date, id)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -89,10 +105,31 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария',
         blank=False
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True, null=True,
+        verbose_name='Ответ на'
+    )
+    # Материализованный путь от корня ветки, см. posts.threads:
+    # сортировка по нему — обход дерева в глубину
+    path = models.CharField('Путь', max_length=255, blank=True)
+    depth = models.PositiveSmallIntegerField('Глубина', default=0)
+    descendants = models.PositiveIntegerField('Ответов в ветке', default=0)
 
     class Meta:
         verbose_name = 'Comment'
         ordering = ['pub_date']
+        # Корни веток листаются по (post, depth, path), а ветка целиком
+        # читается диапазоном по (post, path)
+        indexes = [
+            models.Index(
+                fields=['post', 'depth', 'path'],
+                name='comment_root_idx'),
+            models.Index(
+                fields=['post', 'path'], name='comment_thread_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -124,3 +161,330 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F('author'))
             )
         ]
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: пост, разнесённый подписчику."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Автор и дата продублированы из поста, чтобы чтение ленты
+    # и отписка обходились индексом без join с постами
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Timeline'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_feed_idx'),
+            models.Index(
+                fields=['user', 'author'], name='timeline_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class FeedStrategy(models.Model):
+    """Как посты автора попадают в ленты подписчиков."""
+    PUSH = 'push'
+    PULL = 'pull'
+    STRATEGY_CHOICES = (
+        (PUSH, 'Раскладывать по лентам при публикации'),
+        (PULL, 'Подмешивать в ленты при чтении'),
+    )
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_strategy',
+        verbose_name='Автор'
+    )
+    strategy = models.CharField(
+        'Стратегия',
+        max_length=4,
+        choices=STRATEGY_CHOICES,
+        default=PUSH,
+        db_index=True
+    )
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    changed = models.DateTimeField('Стратегия изменена', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Feed strategy'
+
+    def __str__(self):
+        return f'{self.author}: {self.strategy}'
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик, обновляемый вместе с записью."""
+    name = models.CharField('Счётчик', max_length=32)
+    object_id = models.PositiveIntegerField('Объект')
+    value = models.IntegerField('Значение', default=0)
+
+    class Meta:
+        verbose_name = 'Counter'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'object_id'],
+                name='counter_name_object'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}[{self.object_id}] = {self.value}'
+
+
+class ImageVariant(models.Model):
+    """Готовая копия картинки поста в одной ширине и одном формате."""
+    AVIF = 'avif'
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMAT_CHOICES = (
+        (AVIF, 'AVIF'),
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост'
+    )
+    format = models.CharField(
+        'Формат',
+        max_length=4,
+        choices=FORMAT_CHOICES
+    )
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    file = models.FileField('Файл', upload_to='variants/')
+
+    class Meta:
+        verbose_name = 'Image variant'
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='image_variant_post_format_width'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.format} {self.width}w'
+
+
+class StoredBlob(models.Model):
+    """Файл в хранилище по хешу содержимого и число ссылок на него."""
+    name = models.CharField('Файл', max_length=255, unique=True)
+    references = models.IntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Stored blob'
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
+
+
+class Tag(models.Model):
+    """Хештег из текста поста; имя хранится в нижнем регистре."""
+    name = models.CharField('Тег', max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = 'Tag'
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Строка инвертированного индекса: тег и пост, где он встречается."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Пост'
+    )
+    # Дата продублирована из поста, чтобы лента тега читалась
+    # диапазоном по индексу без join с постами
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Post tag'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='post_tag_tag_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='post_tag_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.post_id}'
+
+
+class TagRollup(models.Model):
+    """Сколько постов с тегом опубликовано за час."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        verbose_name='Тег'
+    )
+    hour = models.DateTimeField('Час')
+    count = models.IntegerField('Постов', default=0)
+
+    class Meta:
+        verbose_name = 'Tag rollup'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'hour'],
+                name='tag_rollup_tag_hour'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='tag_rollup_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id} @ {self.hour}: {self.count}'
+
+
+class Suggestion(models.Model):
+    """Автор, которого стоит предложить читателю; см. posts.recommendations."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.FloatField('Оценка')
+    # Сколько авторов, на которых подписан читатель, читают этого автора
+    mutual = models.PositiveIntegerField('Общих подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Suggestion'
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='suggestion_user_author'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='suggestion_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}: {self.score:.2f}'
+
+
+class PostScore(models.Model):
+    """Затухающая оценка популярности поста; см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Пост'
+    )
+    # Логарифм суммы весов событий, приведённых к общей эпохе
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Post score'
+        indexes = [
+            models.Index(fields=['-score'], name='post_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.3f}'
+
+
+class Change(models.Model):
+    """Событие журнала изменений для дельта-синхронизации; см. posts.changes.
+
+    Номер события — его id: в SQLite он выдаётся с AUTOINCREMENT
+    и не повторяется даже после удаления старых строк.
+    """
+    POST = 'post'
+    COMMENT = 'comment'
+    ENTITY_CHOICES = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    # Пост ушёл из группы group_id: для клиента, следящего за группой,
+    # это удаление, остальным событие не отдаётся
+    LEAVE = 'leave'
+    ACTION_CHOICES = (
+        (CREATE, 'Создан'),
+        (UPDATE, 'Изменён'),
+        (DELETE, 'Удалён'),
+        (LEAVE, 'Ушёл из группы'),
+    )
+    entity = models.CharField('Объект', max_length=7, choices=ENTITY_CHOICES)
+    action = models.CharField('Действие', max_length=6, choices=ACTION_CHOICES)
+    object_id = models.PositiveIntegerField('id объекта')
+    # Пост, его автор и группа (у комментария — его поста) — без внешних
+    # ключей: событие удаления переживает сам объект
+    post_id = models.PositiveIntegerField('id поста')
+    author_id = models.PositiveIntegerField('id автора поста')
+    group_id = models.PositiveIntegerField('id группы', null=True)
+    created = models.DateTimeField('Время', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Change'
+        indexes = [
+            models.Index(
+                fields=['entity', 'object_id', 'id'],
+                name='change_object_idx'),
+            models.Index(fields=['author_id', 'id'], name='change_author_idx'),
+            models.Index(fields=['group_id', 'id'], name='change_group_idx'),
+            models.Index(fields=['created'], name='change_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.pk}: {self.entity} {self.object_id} {self.action}'
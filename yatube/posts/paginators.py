@@ -0,0 +1,200 @@
+import base64
+import heapq
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+POSTS_PER_PAGE = 10
+# Ключ сортировки лент: (pub_date, id) однозначно задаёт позицию поста
+FEED_ORDERING = ('-pub_date', '-id')
+# Ветки комментариев подгружаются пачками, см. posts.threads
+COMMENTS_PER_PAGE = 50
+
+
+def encode_cursor(position, reverse=False):
+    """Упаковывает позицию в ленте в непрозрачный токен для ?cursor=."""
+    payload = json.dumps({'p': position, 'r': reverse}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для битого токена возвращает None."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + padding))
+        return list(data['p']), bool(data['r'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: страница ищется по индексу, без OFFSET и COUNT(*).
+
+    Позиция задаётся значениями полей сортировки последнего показанного
+    объекта, поэтому глубина страницы не влияет на стоимость запроса,
+    а новые записи в начале ленты не сдвигают уже открытые страницы.
+    Нумерованные страницы (get_page) остались как запасной режим.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 count=None, **kwargs):
+        self.ordering = tuple(ordering)
+        # Функция, отдающая заранее известное число объектов (например,
+        # из счётчика), чтобы нумерованный режим не делал COUNT(*)
+        self.count_func = count
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_func is not None:
+            return self.count_func()
+        return super().count
+
+    @property
+    def keys(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_position(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def _parse_position(self, position):
+        model = self.object_list.model
+        if len(position) != len(self.keys):
+            raise ValueError('Cursor does not match ordering')
+        values = [
+            model._meta.get_field(key).to_python(value)
+            for key, value in zip(self.keys, position)
+        ]
+        # Поля сортировки лент не бывают пустыми, а с None нельзя
+        # построить условие «после позиции»
+        if None in values:
+            raise ValueError('Cursor has empty fields')
+        return values
+
+    @staticmethod
+    def _seek(ordering, position, reverse):
+        """Условие «строго после позиции» в порядке обхода."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            key = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{key}__{lookup}': value})
+            equal &= Q(**{key: value})
+        return condition
+
+    @staticmethod
+    def _reversed(ordering):
+        return [
+            field[1:] if field.startswith('-') else '-' + field
+            for field in ordering
+        ]
+
+    def seek(self, queryset, position, reverse, ordering=None):
+        """Срез queryset, начинающийся сразу за позицией."""
+        ordering = ordering or self.ordering
+        queryset = queryset.order_by(
+            *(self._reversed(ordering) if reverse else ordering))
+        if position is not None:
+            queryset = queryset.filter(
+                self._seek(ordering, position, reverse))
+        return queryset
+
+    def fetch(self, position, reverse, limit):
+        return list(self.seek(self.object_list, position, reverse)[:limit])
+
+    def get_cursor_page(self, cursor=None):
+        """Возвращает страницу по токену курсора (пустой — первая)."""
+        decoded = decode_cursor(cursor) if cursor else None
+        position, reverse = None, False
+        if decoded is not None:
+            try:
+                position = self._parse_position(decoded[0])
+                reverse = decoded[1]
+            except (ValueError, TypeError, LookupError, ValidationError):
+                position = None
+        # Лишний объект показывает, есть ли что-то за краем страницы
+        items = self.fetch(position, reverse, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+        return self.build_page(
+            items, cursor,
+            more_after=has_more if not reverse else True,
+            more_before=has_more if reverse else position is not None,
+        )
+
+    def build_page(self, items, cursor, more_after, more_before):
+        """Собирает обычный Page, дополненный курсорами соседних страниц.
+
+        Окно курсорного режима описывается номерами 1-3, чтобы штатные
+        has_next()/has_previous() работали без подсчёта всех объектов.
+        """
+        next_cursor = previous_cursor = None
+        if items and more_after:
+            next_cursor = encode_cursor(self.get_position(items[-1]))
+        if items and more_before:
+            previous_cursor = encode_cursor(
+                self.get_position(items[0]), reverse=True)
+        number = 2 if previous_cursor else 1
+        self.num_pages = number + (1 if next_cursor else 0)
+        page = self._get_page(items, number, self)
+        page.cursor = cursor or ''
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная страница, слитая из нескольких упорядоченных источников.
+
+    sources — тройки (queryset, ordering, transform): transform приводит
+    строку источника к посту. Все источники упорядочены по (pub_date, id)
+    постов, поэтому страница собирается k-way слиянием их префиксов.
+    object_list (обычный queryset постов) нужен только для режима ?page=.
+    """
+
+    def __init__(self, sources, per_page, object_list, **kwargs):
+        self.sources = sources
+        super().__init__(object_list, per_page, **kwargs)
+
+    def fetch(self, position, reverse, limit):
+        streams = [
+            map(transform,
+                self.seek(queryset, position, reverse, ordering)[:limit])
+            for queryset, ordering, transform in self.sources
+        ]
+        merged = heapq.merge(
+            *streams, key=self.get_position, reverse=not reverse)
+        # Позиция однозначно задаёт пост, а у строк источников (моделей
+        # или словарей values()) может не быть общего атрибута pk
+        seen = set()
+        items = []
+        for item in merged:
+            key = tuple(self.get_position(item))
+            if key not in seen:
+                seen.add(key)
+                items.append(item)
+                if len(items) == limit:
+                    break
+        return items
+
+
+def get_page(request, paginator):
+    """Страница ленты: курсорная по умолчанию, нумерованная по ?page=."""
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def paginate(request, queryset, ordering=FEED_ORDERING,
+             per_page=POSTS_PER_PAGE, count=None):
+    return get_page(
+        request, CursorPaginator(queryset, per_page, ordering, count))
@@ -0,0 +1,140 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Граф целиком грузится в разреженную матрицу смежности A (A[u, a] = 1,
+если u подписан на a), и оценки считаются умножением матриц
+по блокам строк, так что память ограничена размером блока:
+
+* друзья друзей — A @ A: сколькими путями u → x → y читатель
+  дотягивается до автора y (это и есть число «общих подписок»);
+* совместные подписки — (A @ Aᵀ) @ A: что ещё читают те, кто читает
+  тех же авторов, что и u. Авторов-«хабов» с подписчиками больше
+  HUB_LIMIT здесь не учитываем: общая подписка на них почти ничего
+  не говорит, а строки A @ Aᵀ от них стали бы плотными.
+
+Для каждого читателя в Suggestion остаются TOP лучших авторов, на
+которых он ещё не подписан. Пересчёт — команда compute_suggestions.
+"""
+import resource
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .models import Follow, Suggestion
+
+TOP = 10
+BLOCK_SIZE = 5000
+HUB_LIMIT = 1000
+NEIGHBOURS = 50
+COFOLLOW_WEIGHT = 0.1
+CHUNK_SIZE = 20000
+
+
+def build_matrix(users, authors):
+    """Узлы графа (отсортированные id) и матрица смежности по ним."""
+    nodes = np.unique(np.concatenate([users, authors]))
+    rows = np.searchsorted(nodes, users)
+    cols = np.searchsorted(nodes, authors)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(nodes), len(nodes)))
+    # Повторы рёбер складываются; подписка всё равно одна
+    matrix.data[:] = 1
+    return nodes, matrix
+
+
+def load_graph():
+    """Таблица Follow, прочитанная потоком прямо в массивы numpy."""
+    pairs = np.fromiter(
+        chain.from_iterable(Follow.objects.order_by().values_list(
+            'user_id', 'author_id').iterator(chunk_size=CHUNK_SIZE)),
+        dtype=np.int64).reshape(-1, 2)
+    return build_matrix(pairs[:, 0], pairs[:, 1])
+
+
+def top_per_row(matrix, top):
+    """Оставляет в каждой строке top самых больших значений.
+
+    Без цикла по строкам: элементы сортируются по (строка, -значение),
+    и ранг внутри строки — это позиция минус начало строки.
+    """
+    matrix = matrix.tocsr()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows))
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = order[rank < top]
+    return sparse.csr_matrix(
+        (matrix.data[keep], (rows[keep], matrix.indices[keep])),
+        shape=matrix.shape)
+
+
+def _without(matrix, mask):
+    matrix = (matrix - matrix.multiply(mask)).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def suggest(matrix, top=TOP, block_size=BLOCK_SIZE, hub_limit=HUB_LIMIT,
+            neighbours=NEIGHBOURS, cofollow_weight=COFOLLOW_WEIGHT):
+    """По блокам строк: (start, stop, строки, столбцы, оценки, общих).
+
+    Строки блока без рекомендаций в массивах не встречаются, но входят
+    в диапазон [start, stop): их прежние рекомендации надо стереть.
+    """
+    size = matrix.shape[0]
+    followers = np.asarray(matrix.sum(axis=0)).ravel()
+    narrow = (matrix @ sparse.diags(
+        (followers <= hub_limit).astype(np.int32), dtype=np.int32)).tocsr()
+    narrow_t = narrow.T.tocsr()
+    for start in range(0, size, block_size):
+        stop = min(start + block_size, size)
+        block = matrix[start:stop]
+        itself = sparse.eye(
+            stop - start, size, k=start, dtype=np.int32, format='csr')
+        mutual = (block @ matrix).tocsr()
+        # Похожие читатели — с наибольшим числом общих авторов; берём
+        # только neighbours лучших, иначе строки быстро становятся плотными
+        similar = top_per_row(
+            _without(narrow[start:stop] @ narrow_t, itself), neighbours)
+        cofollow = similar @ matrix
+        scores = mutual.astype(np.float32) + (
+            cofollow.astype(np.float32) * cofollow_weight)
+        scores = top_per_row(_without(scores, (block + itself) > 0), top)
+        scores = scores.tocoo()
+        counts = np.asarray(mutual[scores.row, scores.col]).ravel()
+        order = np.lexsort((-scores.data, scores.row))
+        yield (start, stop, scores.row[order] + start, scores.col[order],
+               scores.data[order], counts[order])
+
+
+def store(nodes, start, stop, rows, cols, scores, counts):
+    """Заменяет рекомендации читателей блока одной транзакцией."""
+    suggestions = [
+        Suggestion(user_id=user_id, author_id=author_id,
+                   score=score, mutual=count)
+        for user_id, author_id, score, count in zip(
+            nodes[rows].tolist(), nodes[cols].tolist(),
+            scores.tolist(), counts.tolist())
+    ]
+    with transaction.atomic():
+        Suggestion.objects.filter(
+            user_id__gte=int(nodes[start]),
+            user_id__lte=int(nodes[stop - 1])).delete()
+        Suggestion.objects.bulk_create(suggestions, batch_size=1000)
+    return len(suggestions)
+
+
+def drop_orphans():
+    """Стирает рекомендации читателей, у которых не осталось подписок."""
+    return Suggestion.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')).delete()[0]
+
+
+def matrix_bytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def peak_memory():
+    """Пиковый резидентный размер процесса в байтах (Linux: ru_maxrss в КБ)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,244 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (caching, changes, counters, follows, hashtags, threads,
+               timelines, trending)
+from .models import Change, Comment, Follow, Group, ImageVariant, Post
+
+User = get_user_model()
+
+# Счётчики обновляются первыми: стратегия ленты читает их же
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние группу и картинку поста.
+
+    Группа нужна, чтобы перенести счётчик, картинка — чтобы снять
+    ссылку на заменённый файл.
+    """
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.incr(counters.ALL_POSTS)
+        counters.incr(counters.AUTHOR_POSTS, instance.author_id)
+        counters.incr(counters.GROUP_POSTS, instance.group_id)
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id != instance.group_id:
+        counters.decr(counters.GROUP_POSTS, old_group_id)
+        counters.incr(counters.GROUP_POSTS, instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.decr(counters.ALL_POSTS)
+    counters.decr(counters.AUTHOR_POSTS, instance.author_id)
+    counters.decr(counters.GROUP_POSTS, instance.group_id)
+    counters.forget(counters.POST_COMMENTS, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.incr(counters.POST_COMMENTS, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.decr(counters.POST_COMMENTS, instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def attach_comment(sender, instance, created, raw=False, **kwargs):
+    """Встраивает новый комментарий в ветку."""
+    if created and not raw:
+        threads.attach(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def detach_comment(sender, instance, **kwargs):
+    threads.detach(instance)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, raw=False, **kwargs):
+    """Комментарий поднимает пост в популярных."""
+    if created and not raw:
+        trending.comment_added(instance)
+
+
+@receiver(post_save, sender=Follow)
+def score_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.follow_gained(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.incr(counters.FOLLOWERS, instance.author_id)
+        counters.incr(counters.FOLLOWING, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.decr(counters.FOLLOWERS, instance.author_id)
+    counters.decr(counters.FOLLOWING, instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def index_hashtags(sender, instance, raw=False, **kwargs):
+    """Раскладывает теги поста по индексу и сбрасывает ленты тегов."""
+    if not raw:
+        hashtags.invalidate(hashtags.index_posts([instance]))
+
+
+@receiver(pre_delete, sender=Post)
+def unindex_hashtags(sender, instance, **kwargs):
+    # После удаления строки индекса уже снесёт каскад, и теги не узнать
+    hashtags.invalidate(hashtags.unindex_post(instance))
+
+
+@receiver(post_save, sender=Post)
+def log_post_change(sender, instance, created, raw=False, **kwargs):
+    """Записывает изменение в журнал для синхронизации клиентов."""
+    if not raw:
+        changes.post_changed(
+            instance, Change.CREATE if created else Change.UPDATE,
+            getattr(instance, '_saved_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def log_post_delete(sender, instance, **kwargs):
+    changes.post_changed(instance, Change.DELETE)
+
+
+@receiver(post_save, sender=Comment)
+def log_comment_change(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        changes.comment_changed(instance, Change.CREATE)
+
+
+@receiver(post_delete, sender=Comment)
+def log_comment_delete(sender, instance, **kwargs):
+    changes.comment_changed(instance, Change.DELETE)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, raw=False, **kwargs):
+    """Разносит новый пост по лентам подписчиков."""
+    if created and not raw:
+        timelines.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    """Добавляет в ленту посты автора при подписке."""
+    if created and not raw:
+        timelines.classify(instance.author_id)
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    """Убирает из ленты посты автора при отписке."""
+    timelines.remove_author(instance.user_id, instance.author_id)
+    timelines.classify(instance.author_id, create=False)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    """Сбрасывает кэш лент, в которых виден пост."""
+    if raw:
+        return
+    feeds = [
+        caching.index_feed(),
+        caching.profile_feed(instance.author.username),
+        caching.post_feed(instance.pk),
+    ]
+    group_ids = {
+        instance.group_id, getattr(instance, '_saved_group_id', None)}
+    for slug in Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True):
+        feeds.append(caching.group_feed(slug))
+    caching.bump(*feeds)
+    # Новый пост сдвигает ленты подписчиков при раскладке, см. fan_out()
+    if not kwargs.get('created'):
+        timelines.bump_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(caching.post_feed(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, raw=False, **kwargs):
+    # Число подписчиков показано в профиле автора
+    if not raw:
+        caching.bump(
+            caching.follow_feed(instance.user_id),
+            caching.profile_feed(instance.author.username))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_follow_set(sender, instance, raw=False, **kwargs):
+    if not raw:
+        follows.changed(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    """Название группы видно во всех лентах."""
+    if not raw:
+        caching.bump(caching.SHARED, caching.group_feed(instance.slug))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, raw=False,
+                      update_fields=None, **kwargs):
+    """Имя автора видно во всех лентах; вход в систему не в счёт."""
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    caching.bump(caching.SHARED)
+
+
+@receiver(post_delete, sender=ImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    """Файл копии картинки удаляется вместе со строкой и постом."""
+    instance.file.delete(save=False)
+
+
+def _release(file_name, storage):
+    # Ссылки считает только хранилище по хешу, см. posts.storage
+    if file_name and hasattr(storage, 'release'):
+        storage.release(file_name)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw=False, **kwargs):
+    saved_image = getattr(instance, '_saved_image', None)
+    if not created and not raw and saved_image != instance.image.name:
+        _release(saved_image, instance.image.storage)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    _release(instance.image.name, instance.image.storage)
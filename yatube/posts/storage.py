@@ -0,0 +1,99 @@
+"""Хранилище файлов по хешу содержимого.
+
+Файл получает имя по SHA-256 своего содержимого и кладётся в каталог
+по первым байтам хеша: posts/ab/cd/abcd….jpg. Повторная загрузка той же
+картинки не пишет на диск ничего нового, а каталоги остаются небольшими
+при любом числе файлов. Число ссылок на каждый файл хранится в StoredBlob:
+delete() удаляет файл, только когда на него больше никто не ссылается.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .models import StoredBlob
+
+# Сколько уровней каталогов и по сколько символов хеша на уровень
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+HASHED_NAME = re.compile(r'(?:^|/)(?:[0-9a-f]{2}/){2}[0-9a-f]{64}(?:\.\w+)?$')
+
+
+def hashed_name(name, digest):
+    """Имя файла с содержимым digest в каталоге исходного имени."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+    return '/'.join(filter(None, [directory, *shards, digest + extension]))
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # Хеш считается за тот же проход, что и запись во временный файл
+        staging = self.path(os.path.dirname(name) or '.')
+        os.makedirs(staging, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=staging, suffix='.part')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = hashed_name(name, digest.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temporary, self.file_permissions_mode or 0o644)
+                # Одновременные записи одного содержимого безопасны:
+                # os.replace атомарен, а содержимое у них одинаковое
+                os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.acquire(name)
+        return name.replace('\\', '/')
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл."""
+        with transaction.atomic():
+            StoredBlob.objects.get_or_create(name=name)
+            StoredBlob.objects.filter(name=name).update(
+                references=F('references') + 1)
+
+    def release(self, name):
+        """Убирает ссылку на файл; последняя удаляет и сам файл.
+
+        Файлы, которые хранилище не учитывает (сохранённые до него),
+        не трогаются: раньше их никто и не удалял.
+        """
+        with transaction.atomic():
+            blobs = StoredBlob.objects.filter(name=name)
+            if not blobs.update(references=F('references') - 1):
+                return
+            orphaned = blobs.filter(references__lte=0).delete()[0]
+        if orphaned:
+            super().delete(name)
+
+    def delete(self, name):
+        if StoredBlob.objects.filter(name=name).exists():
+            self.release(name)
+        else:
+            super().delete(name)
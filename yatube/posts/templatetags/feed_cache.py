@@ -0,0 +1,53 @@
+import hashlib
+
+from django import template
+
+from posts import caching
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, version, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.version = version
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            timeout = int(timeout)
+        vary_on = ':'.join(str(var.resolve(context)) for var in self.vary_on)
+        digest = hashlib.md5(vary_on.encode()).hexdigest()
+        return caching.get_or_build(
+            f'feed-fragment:{self.name}:{digest}',
+            str(self.version.resolve(context)),
+            lambda: self.nodelist.render(context),
+            timeout,
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """Кэш фрагмента ленты с защитой от лавины пересборок.
+
+    {% feed_cache 3600 index_page feed_version page_obj.number %}
+    Как {% cache %}, но третий аргумент — версия (поколение ленты): она
+    не входит в ключ, поэтому после записи, пока один воркер собирает
+    новую версию, остальные отдают прежнюю.
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 3 arguments.")
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        parser.compile_filter(bits[3]),
+        [parser.compile_filter(bit) for bit in bits[4:]],
+    )
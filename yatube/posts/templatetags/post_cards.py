@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import caching, thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post, variant, group_versions):
+    # В ключе всё, что видно на карточке: правка поста меняет updated,
+    # переименование группы — её поколение, смена имени автора — сам ключ
+    group = ''
+    if post.group_id:
+        group = f'{post.group.slug}.{group_versions[post.group.slug]}'
+    return 'post-card:{}:{}:{}:{}:{}'.format(
+        variant, post.pk, post.updated.timestamp(),
+        post.author.username, group)
+
+
+@register.simple_tag
+def post_cards(posts, variant='feed'):
+    """Готовая разметка карточек постов страницы, по порядку.
+
+    Карточки общие для всех лент и читаются одним get_many; рендерятся
+    только отсутствующие в кэше.
+    """
+    posts = list(posts)
+    slugs = {post.group.slug for post in posts if post.group_id}
+    generations = caching.generations(*map(caching.group_feed, slugs))
+    group_versions = {
+        slug: generations[caching.group_feed(slug)] for slug in slugs}
+    keys = [card_key(post, variant, group_versions) for post in posts]
+    cards = cache.get_many(keys)
+    # Копии картинок и миниатюры нужны только карточкам, которых нет
+    # в кэше; и те и другие читаются пачкой на всю страницу
+    missing = [post for key, post in zip(keys, posts) if key not in cards]
+    prefetch_related_objects(missing, 'image_variants')
+    thumbnails.prefetch(
+        post.image for post in missing if not post.image_variants.all())
+    rendered = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'variant': variant})
+    if rendered:
+        cache.set_many(rendered, settings.PAGE_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
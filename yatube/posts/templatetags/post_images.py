@@ -0,0 +1,18 @@
+from django import template
+
+from posts import variants
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """Картинка поста: <picture> из готовых копий или миниатюра sorl.
+
+    Копии берутся из post.image_variants, поэтому их стоит загрузить
+    заранее через prefetch_related.
+    """
+    return {
+        'post': post,
+        'picture': variants.picture(post.image_variants.all()),
+    }
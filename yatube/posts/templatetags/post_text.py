@@ -0,0 +1,29 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.hashtags import MAX_LENGTH, TAG_RE
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def link_hashtags(text, autoescape=True):
+    """Текст поста, в котором #теги ведут на ленты тегов."""
+    escape = conditional_escape if autoescape else str
+    parts = []
+    start = 0
+    # Экранировать можно только куски между тегами: в экранированном
+    # тексте «&#39;» сам выглядел бы как тег
+    for match in TAG_RE.finditer(text):
+        name = match.group(1)
+        if len(name) > MAX_LENGTH:
+            continue
+        parts.append(escape(text[start:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag_posts', args=[name.lower()]), match.group()))
+        start = match.end()
+    parts.append(escape(text[start:]))
+    return mark_safe(''.join(parts))
@@ -1,8 +1,12 @@
+import time
+from unittest import mock
+
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.cache import cache
 
-from posts.models import Post, User
+from posts import caching
+from posts.models import Follow, Group, Post, User
 
 
 class CacheTests(TestCase):
@@ -19,7 +23,8 @@ class CacheTests(TestCase):
             author=author,
         )
         response1 = self.guest_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
+        # Изменение в обход модели не сдвигает поколение ленты
+        Post.objects.update(text='changed_text')
         response2 = self.guest_client.get(reverse('posts:index'))
         # Проверяем, что клиент все еще отдает пост (из кэша)
         self.assertEqual(response1.content, response2.content)
@@ -28,3 +33,201 @@ class CacheTests(TestCase):
         # Проверяем, что клиент больше не отдает пост
         response3 = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response2.content, response3.content)
+
+    def test_post_delete_invalidates_index(self):
+        """Удаление поста сразу убирает его из кэша главной."""
+        author = User.objects.create_user(username='Lera')
+        Post.objects.create(text='test_text', author=author)
+        response1 = self.guest_client.get(reverse('posts:index'))
+        Post.objects.all().delete()
+        response2 = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('test_text', response1.content.decode())
+        self.assertNotIn('test_text', response2.content.decode())
+
+    def test_group_rename_invalidates_feeds(self):
+        """Переименование группы сбрасывает кэш всех лент."""
+        author = User.objects.create_user(username='Lera')
+        group = Group.objects.create(
+            title='old_title', slug='test_slug', description='-')
+        Post.objects.create(text='test_text', author=author, group=group)
+        self.guest_client.get(reverse('posts:index'))
+        group.title = 'new_title'
+        group.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('new_title', response.content.decode())
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+        cls.post = Post.objects.create(text='test_text', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_etag_answers_not_modified(self):
+        """Совпавший ETag получает 304 без тела."""
+        url = reverse('posts:profile', kwargs={'username': 'Lera'})
+        response = self.guest_client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_lost_change_stamp_disables_if_modified_since(self):
+        """Без отметки о записи в ленту If-Modified-Since не даёт 304."""
+        url = reverse('posts:profile', kwargs={'username': 'Lera'})
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'edited_text'
+        post.save()
+        # Отметки вытеснены, поколения остались
+        cache.delete_many([
+            caching._changed_key(name) for name in
+            (caching.SHARED, caching.profile_feed('Lera'))])
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('edited_text', response.content.decode())
+
+    def test_follow_refreshes_cached_profile(self):
+        """Подписка сразу меняет число подписчиков в кэше профиля."""
+        url = reverse('posts:profile', kwargs={'username': 'Lera'})
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 0')
+        reader = User.objects.create_user(username='Ivan')
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 1')
+        Follow.objects.filter(user=reader).delete()
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 0')
+
+    def test_new_post_refreshes_cached_post_pages(self):
+        """Новый пост автора меняет число его постов на страницах постов."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        count = self.guest_client.get(url).context['count']
+        Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertEqual(
+            self.guest_client.get(url).context['count'], count + 1)
+
+    def test_write_changes_etag(self):
+        """Комментарий к посту меняет ETag его страницы."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        self.post.comments.create(author=self.author, text='comment')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('comment', response.content.decode())
+
+    def test_page_is_served_from_cache(self):
+        """Повторный анонимный запрос не рендерит шаблон заново."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url)
+        self.assertIsNone(response.context)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованный читатель всегда получает свежую страницу."""
+        self.guest_client.force_login(self.author)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn('ETag', response)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+        cls.group = Group.objects.create(
+            title='group_title', slug='test_slug', description='-')
+        cls.post = Post.objects.create(
+            text='test_text', author=cls.author, group=cls.group)
+        cls.other = Post.objects.create(text='other', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def test_edit_rerenders_only_edited_card(self):
+        """Правка поста перерисовывает только его карточку."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.other.pk).update(text='stale')
+        self.post.text = 'edited_text'
+        self.post.save()
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('edited_text', content)
+        # Карточка второго поста не менялась и осталась из кэша
+        self.assertIn('other', content)
+        self.assertNotIn('stale', content)
+
+    def test_group_rename_rerenders_group_cards(self):
+        """Переименование группы обновляет карточки её постов."""
+        self.client.get(reverse('posts:index'))
+        self.group.title = 'new_group_title'
+        self.group.save()
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('new_group_title', content)
+
+    def test_cards_are_shared_between_feeds(self):
+        """Карточка, отрисованная для главной, берётся из кэша в подписках."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='stale')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn('test_text', response.content.decode())
+
+
+class StampedeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return f'value-{self.builds}'
+
+    def test_concurrent_rebuild_serves_stale(self):
+        """Пока ключ пересобирает другой воркер, отдаётся прежняя версия."""
+        caching.get_or_build('key', 'v1', self.build, 60)
+        # Блокировку держит другой воркер
+        cache.add('key:lock', 1)
+        value = caching.get_or_build('key', 'v2', self.build, 60)
+        self.assertEqual(value, 'value-1')
+        self.assertEqual(self.builds, 1)
+        stats = caching.stampede_stats()
+        self.assertEqual(stats['collapsed'], 1)
+        self.assertEqual(stats['stale'], 1)
+        cache.delete('key:lock')
+        value = caching.get_or_build('key', 'v2', self.build, 60)
+        self.assertEqual(value, 'value-2')
+
+    def test_waits_for_rebuild_without_stale_value(self):
+        """Без прежней версии запрос ждёт и в итоге собирает сам."""
+        cache.add('key:lock', 1)
+        with mock.patch.object(caching, 'WAIT_TIMEOUT', 0.01):
+            value = caching.get_or_build('key', 'v1', self.build, 60)
+        self.assertEqual(value, 'value-1')
+        # Чужую будущую запись не перезаписываем
+        self.assertIsNone(cache.get('key'))
+
+    def test_hot_key_is_refreshed_early(self):
+        """Близкая к истечению запись пересобирается заранее."""
+        def slow_build():
+            time.sleep(0.01)
+            return self.build()
+
+        caching.get_or_build('key', 'v1', slow_build, 60)
+        # Выпал очень маленький random(): время пересборки, умноженное
+        # на -log, перекрывает весь остаток срока
+        with mock.patch('posts.caching.math.log', return_value=-10 ** 6):
+            value = caching.get_or_build('key', 'v1', self.build, 60)
+        self.assertEqual(value, 'value-2')
+        self.assertEqual(caching.stampede_stats()['early'], 1)
+        value = caching.get_or_build('key', 'v1', self.build, 60)
+        self.assertEqual(value, 'value-2')
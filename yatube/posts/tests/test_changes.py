@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import changes
+from posts.models import Change, Comment, Group, Post, User
+
+
+class ChangeLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+
+    def log(self):
+        return list(Change.objects.order_by('pk').values_list(
+            'entity', 'action', 'object_id'))
+
+    def age(self, **delta):
+        Change.objects.update(created=timezone.now() - timedelta(**delta))
+
+    def test_writes_are_logged(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.text = 'Правка'
+        post.save()
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий')
+        post_id, comment_id = post.pk, comment.pk
+        post.delete()
+        self.assertEqual(self.log(), [
+            (Change.POST, Change.CREATE, post_id),
+            (Change.POST, Change.UPDATE, post_id),
+            (Change.COMMENT, Change.CREATE, comment_id),
+            (Change.COMMENT, Change.DELETE, comment_id),
+            (Change.POST, Change.DELETE, post_id),
+        ])
+
+    def test_batch_keeps_outcome_per_object(self):
+        """В пачке итог по объекту; созданное и удалённое в ней пропадает."""
+        kept = Post.objects.create(text='Пост', author=self.author)
+        cursor = changes.latest()
+        kept.save()
+        kept.save()
+        gone = Post.objects.create(text='Черновик', author=self.author)
+        gone_id = gone.pk
+        gone.delete()
+        kept_id = kept.pk
+        kept.delete()
+        batch = changes.since(cursor)
+        self.assertEqual(batch.cursor, changes.latest())
+        self.assertFalse(batch.more)
+        self.assertEqual(batch.upserted[Change.POST], [])
+        self.assertEqual(batch.deleted[Change.POST], [kept_id])
+        self.assertNotIn(gone_id, batch.deleted[Change.POST])
+        batch = changes.since(cursor, limit=1)
+        self.assertTrue(batch.more)
+        self.assertEqual(batch.upserted[Change.POST], [kept_id])
+
+    def test_compact_keeps_latest_event_per_object(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        for _ in range(3):
+            post.save()
+        other = Post.objects.create(text='Другой', author=self.author)
+        self.age(seconds=settings.CHANGES_COMPACT_AFTER + 1)
+        self.assertEqual(changes.compact(), 3)
+        self.assertEqual(self.log(), [
+            (Change.POST, Change.UPDATE, post.pk),
+            (Change.POST, Change.CREATE, other.pk),
+        ])
+
+    def test_compact_keeps_group_leave_until_post_returns(self):
+        first, second = (
+            Group.objects.create(title=slug, slug=slug, description='')
+            for slug in ('first', 'second'))
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=first)
+        post.group = second
+        post.save()
+        post.save()
+        self.age(seconds=settings.CHANGES_COMPACT_AFTER + 1)
+        changes.compact()
+        self.assertEqual(self.log(), [
+            (Change.POST, Change.LEAVE, post.pk),
+            (Change.POST, Change.UPDATE, post.pk),
+        ])
+        self.assertEqual(
+            changes.since(0, group_id=first.pk).deleted[Change.POST],
+            [post.pk])
+        post.group = first
+        post.save()
+        self.age(seconds=settings.CHANGES_COMPACT_AFTER + 1)
+        changes.compact()
+        self.assertEqual(self.log(), [
+            (Change.POST, Change.LEAVE, post.pk),
+            (Change.POST, Change.UPDATE, post.pk),
+        ])
+        self.assertEqual(
+            changes.since(0, group_id=first.pk).upserted[Change.POST],
+            [post.pk])
+
+    def test_expire_moves_horizon(self):
+        Post.objects.create(text='Старый', author=self.author)
+        self.age(days=settings.CHANGES_RETENTION_DAYS + 1)
+        last = changes.latest()
+        fresh = Post.objects.create(text='Новый', author=self.author)
+        out = StringIO()
+        call_command('compact_changes', stdout=out)
+        self.assertIn('стёрто: 1', out.getvalue())
+        self.assertEqual(changes.horizon(), last)
+        self.assertEqual(
+            self.log(), [(Change.POST, Change.CREATE, fresh.pk)])
@@ -0,0 +1,166 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import threads
+from posts.models import Comment, Post, User
+from posts.paginators import COMMENTS_PER_PAGE
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        # Не bulk_create: путь в ветке прописывает сигнал post_save
+        for number in range(COMMENTS_PER_PAGE + 10):
+            Comment.objects.create(
+                post=cls.post, author=readers[number % 3],
+                text=f'Комментарий {number}')
+        cls.comments = list(Comment.objects.filter(post=cls.post).order_by(
+            'pub_date', 'id'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_shows_first_batch(self):
+        """На странице поста первая пачка, от старых комментариев к новым."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:COMMENTS_PER_PAGE])
+        self.assertTrue(page.has_next())
+        self.assertContains(response, 'Ещё комментарии')
+
+    def test_fragment_continues_after_cursor(self):
+        """Фрагмент «Ещё» отдаёт следующую пачку без остальной страницы."""
+        page = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk])).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': page.next_cursor})
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[COMMENTS_PER_PAGE:])
+        content = response.content.decode()
+        self.assertNotIn('<html', content)
+        self.assertNotIn('Ещё комментарии', content)
+
+    def test_fragment_queries_do_not_grow_with_comments(self):
+        """Авторы комментариев читаются тем же запросом, что и комментарии."""
+        self.client.force_login(self.author)
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        small = Post.objects.create(text='Тихий пост', author=self.author)
+        Comment.objects.create(post=small, author=self.author, text='Один')
+        with CaptureQueriesContext(connection) as busy:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as quiet:
+            self.client.get(
+                reverse('posts:post_comments', args=[small.pk]))
+        self.assertEqual(len(busy), len(quiet))
+
+    def test_fragment_for_missing_post(self):
+        """Фрагмент несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def reply(self, parent, text):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=text,
+            parent=threads.reply_target(parent))
+
+    def test_thread_order_and_descendant_counts(self):
+        """Ответы идут под своим комментарием по дате, счётчики веток верны."""
+        first = self.reply(None, 'первый')
+        second = self.reply(None, 'второй')
+        answer = self.reply(first, 'ответ')
+        nested = self.reply(answer, 'ответ на ответ')
+        later = self.reply(first, 'поздний ответ')
+        page = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk])).context['comments']
+        self.assertEqual(list(page), [first, second])
+        self.assertEqual(page.thread, [first, answer, nested, later, second])
+        first.refresh_from_db()
+        self.assertEqual(first.descendants, 3)
+        answer.delete()
+        first.refresh_from_db()
+        self.assertEqual(first.descendants, 1)
+
+    def test_subtree_is_one_query(self):
+        """Ветки страницы читаются одним запросом, сколько бы их ни было."""
+        parent = None
+        for number in range(threads.DISPLAY_DEPTH + 1):
+            parent = self.reply(parent, f'уровень {number}')
+        roots = list(Comment.objects.filter(post=self.post, depth=0))
+        with self.assertNumQueries(1):
+            thread = threads.load(self.post.pk, roots)
+            [comment.author.username for comment in thread]
+
+    def test_deep_threads_collapse_and_expand(self):
+        """Глубже DISPLAY_DEPTH ветка свёрнута и раскрывается фрагментом."""
+        chain = [None]
+        for number in range(threads.DISPLAY_DEPTH + 2):
+            chain.append(self.reply(chain[-1], f'уровень {number}'))
+        page = self.client.get(reverse(
+            'posts:post_detail', args=[self.post.pk])).context['comments']
+        collapsed = page.thread[-1]
+        self.assertEqual(collapsed, chain[threads.DISPLAY_DEPTH + 1])
+        self.assertTrue(collapsed.collapsed)
+        response = self.client.get(reverse(
+            'posts:comment_replies', args=[self.post.pk, collapsed.pk]))
+        self.assertEqual(list(response.context['thread']), chain[-1:])
+        self.assertContains(response, 'уровень')
+
+    def test_depth_is_bounded(self):
+        """Ответ глубже MAX_DEPTH становится соседом комментария."""
+        parent = None
+        for number in range(threads.MAX_DEPTH + 2):
+            parent = self.reply(parent, f'уровень {number}')
+        self.assertEqual(parent.depth, threads.MAX_DEPTH)
+        self.assertLessEqual(
+            len(parent.path), Comment._meta.get_field('path').max_length)
+
+    def test_reply_through_view(self):
+        """Форма отвечает на комментарий, указанный в parent."""
+        root = self.reply(None, 'корень')
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'ответ', 'parent': root.pk})
+        reply = Comment.objects.get(text='ответ')
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(reply.depth, 1)
+
+    def test_bad_reply_target_is_ignored(self):
+        """Непонятный номер комментария не ломает страницу и форму."""
+        root = self.reply(None, 'корень')
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        for value in ('²', 'abc', ''):
+            with self.subTest(value=value):
+                response = self.client.get(url, {'reply_to': value})
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['reply_to'])
+        self.assertEqual(
+            self.client.get(url, {'reply_to': root.pk}).context['reply_to'],
+            root)
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'ответ', 'parent': '²'})
+        self.assertIsNone(Comment.objects.get(text='ответ').parent)
@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Comment, Counter, Follow, Group, Post, User
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other_group_title',
+            slug='other_slug',
+            description='other_description',
+        )
+        cls.post = Post.objects.create(
+            text='test_text', author=cls.author, group=cls.group)
+
+    def test_counters_follow_writes(self):
+        """Тест: счётчики следуют за постами, комментариями и подписками."""
+        Post.objects.create(text='ещё', author=self.author, group=self.group)
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(counters.get(counters.ALL_POSTS), 2)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 2)
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 2)
+        self.assertEqual(counters.get(counters.POST_COMMENTS, self.post.pk), 1)
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.author.pk), 1)
+        self.assertEqual(counters.get(counters.FOLLOWING, self.reader.pk), 1)
+        Follow.objects.all().delete()
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.author.pk), 0)
+
+    def test_group_change_moves_count(self):
+        """Тест: смена группы переносит пост между счётчиками групп."""
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk), 0)
+        self.assertEqual(
+            counters.get(counters.GROUP_POSTS, self.other_group.pk), 1)
+
+    def test_post_detail_reads_counter(self):
+        """Тест: post_detail берёт число постов автора из счётчика."""
+        Counter.objects.filter(name=counters.AUTHOR_POSTS).update(value=7)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.context['count'], 7)
+
+    def test_reconcile_fixes_drift(self):
+        """Тест: reconcile_counters исправляет разошедшиеся счётчики."""
+        Counter.objects.filter(name=counters.AUTHOR_POSTS).update(value=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 1)
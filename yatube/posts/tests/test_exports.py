@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import exports
+from posts.models import Comment, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+        cls.reader = User.objects.create_user(username='Ivan')
+        cls.admin = User.objects.create_user(username='Admin', is_staff=True)
+        group = Group.objects.create(
+            title='Осень', slug='autumn', description='Про осень')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=group,
+                # Одна и та же картинка у двух постов
+                image=SimpleUploadedFile(f'{number}.gif', SMALL_GIF))
+            for number in range(2)
+        ]
+        cls.posts += [
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+            for number in range(2, 7)
+        ]
+        other = Post.objects.create(text='Чужой', author=cls.reader)
+        cls.comment = Comment.objects.create(
+            post=other, author=cls.author, text='Комментарий')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Не его')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def url(self, extension):
+        return reverse(
+            'posts:profile_export',
+            args=[self.author.username]) + f'?format={extension}'
+
+    def download(self, extension):
+        response = self.client.get(self.url(extension))
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def check_records(self, content):
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.pk) for post in self.posts]
+            + [('comment', self.comment.pk)])
+        self.assertEqual(records[0]['group'], 'autumn')
+        self.assertEqual(records[0]['image'], self.posts[0].image.name)
+        self.assertEqual(records[-1]['post'], self.comment.post_id)
+
+    def test_ndjson(self):
+        self.client.force_login(self.author)
+        with mock.patch.object(exports, 'BATCH_SIZE', 3):
+            response, content = self.download('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            response['Content-Disposition'],
+            "attachment; filename*=UTF-8''Lera.ndjson")
+        self.check_records(content)
+
+    def test_batches_are_separate_queries(self):
+        """Каждая пачка читается своим запросом, без открытого курсора."""
+        chunks = exports.ndjson(self.author)
+        with mock.patch.object(exports, 'BATCH_SIZE', 3):
+            # Посты: 3 + 3 + 1 и пустая пачка; комментарии: 1 и пустая
+            with self.assertNumQueries(6):
+                self.assertEqual(len(list(chunks)), 4)
+
+    def test_zip_with_images(self):
+        self.client.force_login(self.author)
+        response, content = self.download('zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(content)) as bundle:
+            self.assertIsNone(bundle.testzip())
+            self.assertEqual(
+                bundle.namelist(),
+                [exports.NDJSON_NAME, self.posts[0].image.name])
+            self.check_records(bundle.read(exports.NDJSON_NAME))
+            self.assertEqual(
+                bundle.read(self.posts[0].image.name), SMALL_GIF)
+
+    def test_access(self):
+        url = self.url('ndjson')
+        self.assertRedirects(
+            self.client.get(url),
+            '/auth/login/?next=/profile/Lera/export/%3Fformat%3Dndjson')
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(self.url('xml')).status_code, 400)
+
+    def test_command(self):
+        output = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        call_command(
+            'export_posts', '--format', 'zip', '--output', output,
+            stdout=StringIO())
+        self.assertEqual(
+            sorted(os.listdir(output)), ['Ivan.zip', 'Lera.zip'])
+        with zipfile.ZipFile(os.path.join(output, 'Lera.zip')) as bundle:
+            self.check_records(bundle.read(exports.NDJSON_NAME))
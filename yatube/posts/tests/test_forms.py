@@ -1,5 +1,9 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from http import HTTPStatus
 
@@ -7,9 +11,11 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from PIL import Image
 
 from posts.forms import PostForm, CommentForm
 from posts.models import Group, Post, User, Comment
+from posts.storage import hashed_name
 
 
 # Создаем временную папку для медиа-файлов;
@@ -92,7 +98,9 @@ class CreateFormTests(TestCase):
         self.assertEqual(created_post.text, form_data['text'])
         self.assertEqual(created_post.author, self.author)
         self.assertEqual(created_post.group, self.group)
-        self.assertEqual(created_post.image, 'posts/small.gif')
+        # Файл назван по хешу содержимого, см. posts.storage
+        self.assertEqual(created_post.image, hashed_name(
+            'posts/small.gif', hashlib.sha256(small_gif).hexdigest()))
         # Проверяем, увеличилось ли число постов
         self.assertEqual(Post.objects.count(), post_count + 1)
 
@@ -206,3 +214,68 @@ class CommentFormTests(TestCase):
                 post=self.post
             ).exists()
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    @staticmethod
+    def image_file(name, size, exif=None, image_format='JPEG'):
+        buffer = BytesIO()
+        # Шум не сжимается, поэтому размер файла предсказуем
+        image = Image.frombytes(
+            'RGB', size, os.urandom(size[0] * size[1] * 3))
+        if exif is not None:
+            image.save(buffer, image_format, exif=exif)
+        else:
+            image.save(buffer, image_format)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def post_image(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'test_upload', 'image': image})
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_too_large_file_is_rejected(self):
+        """Файл больше лимита отклоняется с понятной ошибкой."""
+        response = self.post_image(self.image_file(
+            'noise.png', (200, 200), image_format='PNG'))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 0 МБ.')
+        self.assertFalse(Post.objects.filter(text='test_upload').exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_is_rejected_by_header(self):
+        """Картинка с лишними пикселями отклоняется по заголовку."""
+        image = self.image_file('big.jpg', (20, 20))
+        with mock.patch('PIL.ImageFile.ImageFile.load') as load:
+            response = self.post_image(image)
+        load.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 мегапикселей.')
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_oversized_image_is_downscaled_without_exif(self):
+        """Большой оригинал уменьшается, EXIF из него убирается."""
+        exif = Image.Exif()
+        # 0x010f — производитель камеры
+        exif[0x010f] = 'test camera'
+        self.post_image(self.image_file(
+            'photo.jpg', (400, 200), exif=exif.tobytes()))
+        post = Post.objects.get(text='test_upload')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertFalse(image.getexif())
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counters, hashtags
+from posts.models import Post, PostTag, Tag, TagRollup, User
+
+
+class HashtagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+
+    def tags_of(self, post):
+        return set(PostTag.objects.filter(post=post).values_list(
+            'tag__name', flat=True))
+
+    def test_extract(self):
+        """Теги в нижнем регистре; якоря и мнемоники HTML не теги."""
+        self.assertEqual(
+            hashtags.extract('#Осень и #лес, page#top &#39; ##x #лес'),
+            {'осень', 'лес'})
+
+    def test_index_follows_post_text(self):
+        """Теги раскладываются при сохранении и снимаются при правке."""
+        post = Post.objects.create(text='#осень #лес', author=self.author)
+        self.assertEqual(self.tags_of(post), {'осень', 'лес'})
+        post.text = '#осень #дождь'
+        post.save()
+        self.assertEqual(self.tags_of(post), {'осень', 'дождь'})
+        forest = Tag.objects.get(name='лес')
+        self.assertEqual(counters.get(counters.TAG_POSTS, forest.pk), 0)
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+
+    def test_rollups_give_trending(self):
+        """Тренды считаются по почасовым итогам и следуют за удалением."""
+        for text in ('#осень', '#осень #лес', '#лес #осень'):
+            Post.objects.create(text=text, author=self.author)
+        hidden = Post.objects.create(text='#лес', author=self.author)
+        self.assertEqual(
+            hashtags.trending(), [('лес', 3), ('осень', 3)])
+        hidden.delete()
+        self.assertEqual(
+            hashtags.trending(), [('осень', 3), ('лес', 2)])
+        self.assertEqual(TagRollup.objects.count(), 2)
+
+    def test_old_posts_skip_rollups_and_prune(self):
+        """Старые посты не попадают в итоги, старые итоги удаляются."""
+        post = Post.objects.create(text='#архив', author=self.author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        PostTag.objects.all().delete()
+        TagRollup.objects.all().delete()
+        hashtags.index_posts(Post.objects.all())
+        self.assertEqual(self.tags_of(post), {'архив'})
+        self.assertFalse(TagRollup.objects.exists())
+        TagRollup.objects.create(
+            tag=Tag.objects.get(name='архив'), count=1,
+            hour=hashtags.hour_of(timezone.now() - timedelta(days=30)))
+        self.assertEqual(hashtags.prune(), 1)
+
+    def test_backfill_indexes_existing_posts(self):
+        """Дозаполнение разбирает посты, записанные в обход сигналов."""
+        Post.objects.bulk_create([
+            Post(text=f'пост {number} #старое', author=self.author)
+            for number in range(5)
+        ])
+        call_command('backfill_hashtags', batch_size=2, stdout=StringIO())
+        tag = Tag.objects.get(name='старое')
+        self.assertEqual(tag.post_tags.count(), 5)
+        self.assertEqual(counters.get(counters.TAG_POSTS, tag.pk), 5)
+        # Повторный проход ничего не добавляет
+        call_command('backfill_hashtags', stdout=StringIO())
+        self.assertEqual(tag.post_tags.count(), 5)
+        self.assertEqual(TagRollup.objects.get(tag=tag).count, 5)
+
+    def test_tag_feed_pages_through_index(self):
+        """Лента тега листается курсором по индексу, новые посты первыми."""
+        posts = [
+            Post.objects.create(text=f'#лента {number}', author=self.author)
+            for number in range(12)
+        ]
+        Post.objects.create(text='без тега', author=self.author)
+        url = reverse('posts:tag_posts', args=['лента'])
+        first = self.client.get(url).context['page_obj']
+        self.assertEqual(list(first), posts[::-1][:10])
+        self.assertIn('<a href="/tag/%D0%BB%D0%B5%D0%BD%D1%82%D0%B0/">'
+                      '#лента</a>', self.client.get(url).content.decode())
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(second), posts[1::-1])
+
+    def test_tag_feed_lowercases_name(self):
+        """Адрес тега в другом регистре ведёт на основной."""
+        Post.objects.create(text='#Лента', author=self.author)
+        response = self.client.get(
+            reverse('posts:tag_posts', args=['ЛЕНТА']))
+        self.assertRedirects(
+            response, reverse('posts:tag_posts', args=['лента']))
+        self.assertEqual(self.client.get(
+            reverse('posts:tag_posts', args=['нет'])).status_code, 404)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+
+from posts import changes, live
+from posts.models import Follow, Post, User
+
+
+class FakeWriter:
+    def __init__(self, buffered=0):
+        self.chunks = []
+        self.closed = False
+        self.transport = mock.Mock(
+            get_write_buffer_size=mock.Mock(return_value=buffered))
+
+    def write(self, data):
+        self.chunks.append(data.decode())
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+async def inline(func, *args):
+    # В тестах база живёт в транзакции основного потока
+    return func(*args)
+
+
+class HubTests(TestCase):
+    def connect(self, hub, authors, buffered=0):
+        connection = live.Connection(FakeWriter(buffered), 0, set(authors))
+        hub.add(connection)
+        return connection
+
+    def test_publish_fans_out_to_followers(self):
+        hub = live.Hub()
+        both = self.connect(hub, {1, 2})
+        one = self.connect(hub, {1})
+        other = self.connect(hub, {3})
+        self.assertEqual(hub.publish([1, 2, 2]), 2)
+        self.assertEqual(hub.publish([2]), 1)
+        self.assertEqual(
+            both.writer.chunks,
+            ['event: new-posts\ndata: {"count": 3}\n\n',
+             'event: new-posts\ndata: {"count": 4}\n\n'])
+        self.assertEqual(
+            one.writer.chunks, ['event: new-posts\ndata: {"count": 1}\n\n'])
+        self.assertEqual(other.writer.chunks, [])
+
+    def test_slow_and_closed_connections_are_dropped(self):
+        hub = live.Hub()
+        slow = self.connect(hub, {1}, buffered=live.MAX_BUFFER + 1)
+        gone = self.connect(hub, {1})
+        gone.writer.closed = True
+        alive = self.connect(hub, {2})
+        hub.publish([1])
+        hub.ping()
+        self.assertTrue(slow.writer.closed)
+        self.assertEqual(hub.connections, {alive})
+        self.assertNotIn(1, hub.by_author)
+        self.assertEqual(alive.writer.chunks, [': ping\n\n'])
+
+
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.reader = User.objects.create_user(username='Ivan')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_new_posts_reads_only_publications(self):
+        cursor = changes.latest()
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.text = 'Правка'
+        post.save()
+        Post.objects.create(text='Ещё', author=self.reader)
+        cursor, authors = live.new_posts(cursor)
+        self.assertEqual(authors, [self.author.pk, self.reader.pk])
+        self.assertEqual(cursor, changes.latest())
+        self.assertEqual(live.new_posts(cursor), (cursor, []))
+
+    def test_identify(self):
+        self.client.force_login(self.reader)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertEqual(
+            live.identify(session_key), (self.reader.pk, {self.author.pk}))
+        self.assertIsNone(live.identify('missing'))
+
+    async def request(self, port, cookie=''):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(
+            f'GET {live.PATH} HTTP/1.1\r\nHost: localhost\r\n'
+            f'Cookie: {cookie}\r\n\r\n'.encode())
+        head = await reader.readuntil(b'\r\n\r\n')
+        return reader, writer, head.decode()
+
+    async def stream(self, cookie):
+        hub = live.Hub()
+        server = await asyncio.start_server(
+            live.handler(hub), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            _, writer, head = await self.request(port)
+            self.assertIn('401', head.splitlines()[0])
+            writer.close()
+            reader, writer, head = await self.request(port, cookie)
+            self.assertIn('text/event-stream', head)
+            self.assertEqual(
+                await reader.readuntil(b'\n\n'),
+                f'retry: {live.RETRY}\n\n'.encode())
+            cursor = changes.latest()
+            Post.objects.create(text='Пост', author=self.author)
+            watcher = asyncio.ensure_future(
+                live.watch(hub, interval=0.01, cursor=cursor))
+            event = await asyncio.wait_for(reader.readuntil(b'\n\n'), 5)
+            watcher.cancel()
+            writer.close()
+            await writer.wait_closed()
+            # Обрыв снимает соединение с хаба
+            for _ in range(100):
+                if not hub.connections:
+                    break
+                await asyncio.sleep(0.01)
+        self.assertEqual(hub.connections, set())
+        return event.decode()
+
+    def test_stream_end_to_end(self):
+        self.client.force_login(self.reader)
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        with mock.patch.object(live, 'db', inline):
+            event = asyncio.run(self.stream(
+                f'{cookie.key}={cookie.value}'))
+        name, data = event.strip().split('\n')
+        self.assertEqual(name, f'event: {live.EVENT}')
+        self.assertEqual(json.loads(data[len('data: '):]), {'count': 1})
@@ -0,0 +1,94 @@
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import Follow, Suggestion, User
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'star', 'twin', 'hidden',
+                         'lonely')
+        }
+        for user, author in (
+            ('reader', 'friend'),
+            # Друг друга: reader → friend → star
+            ('friend', 'star'),
+            # Совместная подписка: twin читает того же friend и ещё hidden
+            ('twin', 'friend'),
+            ('twin', 'hidden'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return list(Suggestion.objects.filter(
+            user=self.users[name]).values_list('author__username', 'mutual'))
+
+    def compute(self):
+        call_command('compute_suggestions', stdout=StringIO())
+
+    def test_friends_of_friends_rank_above_cofollows(self):
+        """Друг друга впереди, совместные подписки — следом."""
+        self.compute()
+        self.assertEqual(
+            self.suggested('reader'), [('star', 1), ('hidden', 0)])
+
+    def test_followed_and_self_are_excluded(self):
+        """Уже прочитанные авторы и сам читатель не предлагаются."""
+        self.compute()
+        for name in self.users:
+            with self.subTest(name=name):
+                suggested = {author for author, _ in self.suggested(name)}
+                followed = set(Follow.objects.filter(
+                    user=self.users[name]).values_list(
+                    'author__username', flat=True))
+                self.assertFalse(suggested & (followed | {name}))
+
+    def test_recompute_replaces_stale_rows(self):
+        """Пересчёт стирает рекомендации тех, у кого не осталось подписок."""
+        self.compute()
+        Follow.objects.filter(user=self.users['reader']).delete()
+        self.compute()
+        self.assertEqual(self.suggested('reader'), [])
+
+    def test_top_per_row(self):
+        """В каждой строке остаются лучшие значения."""
+        matrix = recommendations.sparse.csr_matrix(np.array([
+            [1, 5, 3, 0],
+            [0, 0, 0, 0],
+            [2, 0, 0, 7],
+        ], dtype=np.float32))
+        top = recommendations.top_per_row(matrix, 2).toarray()
+        self.assertEqual(top.tolist(), [
+            [0, 5, 3, 0],
+            [0, 0, 0, 0],
+            [2, 0, 0, 7],
+        ])
+
+    def test_follow_page_shows_fresh_suggestions(self):
+        """Страница подписок показывает рекомендации без новых подписок."""
+        self.compute()
+        self.client.force_login(self.users['reader'])
+        url = reverse('posts:follow_index')
+        suggestions = self.client.get(url).context['suggestions']
+        self.assertEqual(
+            [suggestion.author.username for suggestion in suggestions],
+            ['star', 'hidden'])
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['star'])
+        suggestions = self.client.get(url).context['suggestions']
+        self.assertEqual(
+            [suggestion.author.username for suggestion in suggestions],
+            ['hidden'])
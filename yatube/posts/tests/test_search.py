@@ -0,0 +1,69 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import fulltext
+from posts.models import Comment, Post, User
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.post = Post.objects.create(
+            text='Прогулка по осеннему лесу <b>', author=cls.author)
+        cls.other = Post.objects.create(
+            text='Рецепт пирога', author=cls.author)
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+
+    def test_post_is_found_with_highlighted_snippet(self):
+        """Пост находится по слову из текста, совпадение подсвечено."""
+        response = self.search('лесу')
+        results = response.context['results']
+        self.assertEqual([result['post'] for result in results], [self.post])
+        self.assertIn('<mark>лесу</mark>', results[0]['snippet'])
+        # Текст поста экранирован, размечены только совпадения
+        self.assertIn('&lt;b&gt;', results[0]['snippet'])
+
+    def test_post_is_found_by_comment(self):
+        """Пост находится и по тексту комментария к нему."""
+        Comment.objects.create(
+            post=self.other, author=self.author, text='Добавьте корицы')
+        results = self.search('кориц').context['results']
+        self.assertEqual([result['post'] for result in results], [self.other])
+        self.assertIn('<mark>корицы</mark>', results[0]['snippet'])
+
+    def test_index_follows_bulk_changes(self):
+        """Индекс обновляют триггеры, даже в обход сигналов."""
+        Post.objects.filter(pk=self.other.pk).update(text='Рецепт торта')
+        self.assertEqual(fulltext.find('торт'), [self.other.pk])
+        self.assertEqual(fulltext.find('пирога'), [])
+        Post.objects.filter(pk=self.other.pk).delete()
+        self.assertEqual(fulltext.find('торт'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Спецсимволы FTS5 в запросе не ломают поиск."""
+        for query in ('"', 'лес NEAR(', 'text:лес', '*', '-'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+    def test_pagination_keeps_query(self):
+        """Ссылки на страницы выдачи сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(text=f'Рецепт номер {index}', author=self.author)
+            for index in range(15))
+        response = self.search('рецепт')
+        self.assertEqual(response.context['page_obj'].paginator.count, 16)
+        self.assertContains(response, '?q=%D1%80%D0%B5%D1%86%D0%B5%D0%BF')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лес'})
+        self.assertEqual(
+            list(response.context['cl'].queryset), [self.post])
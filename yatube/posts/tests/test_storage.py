@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Post, StoredBlob, User
+from posts.storage import is_hashed
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            text='test_text', author=self.author,
+            image=SimpleUploadedFile(name, content))
+
+    def test_same_picture_is_stored_once(self):
+        """Повторная загрузка той же картинки не создаёт новый файл."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertEqual(
+            StoredBlob.objects.get(name=first.image.name).references, 2)
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, только когда на него не ссылается ни один пост."""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        """Замена картинки снимает ссылку с прежнего файла."""
+        post = self.create_post()
+        path = post.image.path
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\x00')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+
+    def test_migrate_media_rewrites_legacy_paths(self):
+        """Команда переносит старые файлы и переписывает пути."""
+        legacy = FileSystemStorage().save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF))
+        post = Post.objects.create(
+            text='test_text', author=self.author, image=legacy)
+        call_command('migrate_media', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(is_hashed(post.image.name))
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_MEDIA_ROOT, legacy)))
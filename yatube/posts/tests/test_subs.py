@@ -1,8 +1,15 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Post, User, Follow
+from .. import caching, follows, timelines
+from ..models import FeedStrategy, Post, User, Follow, Timeline
 
 User = get_user_model()
 
@@ -72,3 +79,210 @@ class FollowModelTest(TestCase):
         response = self.authorized_client_another_user.get(
             reverse('posts:follow_index'))
         self.assertEqual(0, len(response.context['page_obj']))
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def test_follow_backfills_timeline(self):
+        """Тест: при подписке в ленту попадают прежние посты автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(Timeline.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Тест: новый пост разносится по лентам подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        client = Client()
+        client.force_login(self.follower)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_unfollow_removes_author_posts(self):
+        """Тест: после отписки посты автора уходят из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(
+            user=self.follower, author=self.author).delete()
+        self.assertFalse(
+            Timeline.objects.filter(user=self.follower).exists())
+
+    def test_timeline_is_capped(self):
+        """Тест: trim_timelines обрезает ленту до заданной длины."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        with override_settings(TIMELINE_MAX_LENGTH=2):
+            posts = [
+                Post.objects.create(author=self.author, text=f'Пост {i}')
+                for i in range(3)
+            ]
+            call_command('trim_timelines', stdout=mock.Mock())
+        self.assertEqual(
+            set(Timeline.objects.filter(user=self.follower).values_list(
+                'post_id', flat=True)),
+            {posts[1].pk, posts[2].pk})
+
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Тест: раскладка поста не делает запрос на каждого подписчика."""
+        def queries():
+            with CaptureQueriesContext(connection) as context:
+                Post.objects.create(author=self.author, text='Пост')
+            return len(context)
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        few = queries()
+        for number in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'fan{number}'),
+                author=self.author)
+        self.assertEqual(queries(), few)
+
+    def test_rebuild_command_restores_timeline(self):
+        """Тест: команда rebuild_timelines пересобирает ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=mock.Mock())
+        self.assertTrue(Timeline.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+
+
+@override_settings(FEED_FANOUT_THRESHOLD=2)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='regular')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        for user in (self.reader, self.fan):
+            Follow.objects.create(user=user, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_popular_author_is_pulled(self):
+        """Тест: автор с подписчиками выше порога не раскладывается."""
+        self.assertEqual(FeedStrategy.objects.get(
+            author=self.star).strategy, FeedStrategy.PULL)
+        Post.objects.create(author=self.star, text='Звезда')
+        self.assertFalse(
+            Timeline.objects.filter(author=self.star).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Тест: лента сливает оба источника по дате публикации."""
+        posts = [
+            Post.objects.create(author=author, text=str(i))
+            for i, author in enumerate(
+                [self.star, self.author, self.star] * 4)
+        ]
+        response = self.client.get(reverse('posts:follow_index'))
+        page = response.context['page_obj']
+        self.assertEqual(list(page), posts[::-1][:10])
+        response = self.client.get(
+            reverse('posts:follow_index') + f'?cursor={page.next_cursor}')
+        self.assertEqual(
+            list(response.context['page_obj']), posts[::-1][10:])
+
+    def test_follow_page_version_tracks_both_modes(self):
+        """Тест: версия ленты — своя лента и профили pull-авторов."""
+        self.assertEqual(timelines.follow_feeds(self.reader), [
+            caching.follow_feed(self.reader.pk),
+            caching.profile_feed(self.star.username),
+        ])
+        post = Post.objects.create(author=self.author, text='Пост')
+
+        def edit():
+            post.text = 'Правка'
+            post.save()
+
+        changes = [
+            lambda: Post.objects.create(author=self.author, text='Ещё'),
+            edit,
+            post.delete,
+            lambda: Post.objects.create(author=self.star, text='Звезда'),
+        ]
+        for change in changes:
+            before = caching.version(*timelines.follow_feeds(self.reader))
+            change()
+            self.assertNotEqual(
+                caching.version(*timelines.follow_feeds(self.reader)),
+                before)
+
+    def test_author_returns_to_push_below_half_threshold(self):
+        """Тест: при оттоке подписчиков автор снова раскладывается."""
+        post = Post.objects.create(author=self.star, text='Звезда')
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        Follow.objects.filter(user=self.reader, author=self.star).delete()
+        Follow.objects.create(user=self.fan, author=self.star)
+        self.assertEqual(FeedStrategy.objects.get(
+            author=self.star).strategy, FeedStrategy.PUSH)
+        self.assertTrue(Timeline.objects.filter(
+            user=self.fan, post=post).exists())
+
+
+class FollowSetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        for author in cls.authors[1::2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_reader(self):
+        # Новый объект — как request.user следующего запроса
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_batch_lookup_without_queries(self):
+        """Тест: подписки на всю страницу авторов — из кэша, без запросов."""
+        ids = [author.pk for author in self.authors]
+        expected = {author.pk: i % 2 == 1
+                    for i, author in enumerate(self.authors)}
+        self.assertEqual(
+            follows.is_following_many(self.fresh_reader(), ids), expected)
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follows.is_following_many(reader, ids), expected)
+            follows.is_following(reader, self.authors[0].pk)
+
+    def test_follow_and_unfollow_update_set(self):
+        """Тест: подписка и отписка сразу видны в профиле."""
+        client = Client()
+        client.force_login(self.reader)
+        author = self.authors[0]
+        url = reverse('posts:profile', kwargs={'username': author.username})
+        self.assertFalse(client.get(url).context['following'])
+        callbacks = []
+        with mock.patch('django.db.transaction.on_commit',
+                        side_effect=callbacks.append):
+            client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author.username}))
+        self.assertTrue(client.get(url).context['following'])
+        # После коммита множество перечитывается и снова лежит в кэше
+        for callback in callbacks:
+            callback()
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            self.assertTrue(follows.is_following(reader, author.pk))
+        client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}))
+        self.assertFalse(client.get(url).context['following'])
+
+    def test_anonymous_follows_nobody(self):
+        """Тест: у анонима подписок нет, и база не спрашивается."""
+        anonymous = Client().get(reverse('posts:index')).wsgi_request.user
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follows.is_following_many(anonymous, [self.authors[1].pk]),
+                {self.authors[1].pk: False})
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class EagerThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Lera')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.lru.clear()
+        self.client.force_login(self.author)
+
+    def create_post(self, callbacks):
+        # Тестовая транзакция не коммитится: колбэки on_commit собираем сами
+        uploaded = SimpleUploadedFile(
+            name='small.gif', content=SMALL_GIF, content_type='image/gif')
+        with mock.patch('django.db.transaction.on_commit',
+                        side_effect=callbacks.append):
+            self.client.post(
+                reverse('posts:post_create'),
+                data={'text': 'test_text', 'image': uploaded})
+        return Post.objects.get(text='test_text')
+
+    def test_thumbnail_is_generated_after_commit(self):
+        """Миниатюра готова к показу сразу после коммита поста."""
+        callbacks = []
+        post = self.create_post(callbacks)
+        for callback in callbacks:
+            callback()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, '<img class="card-img my-2"')
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюра готовится, страница отдаёт заглушку."""
+        callbacks = []
+        post = self.create_post(callbacks)
+        url = reverse('posts:index')
+        content = self.client.get(url).content.decode()
+        self.assertNotIn('<img class="card-img my-2"', content)
+        self.assertIn('aspect-ratio: 960 / 339', content)
+        for callback in callbacks:
+            callback()
+        # Готовая миниатюра сбрасывает закэшированную карточку с заглушкой
+        self.assertContains(self.client.get(url), 'src="/media/variants/')
+        self.assertNotEqual(
+            Post.objects.get(pk=post.pk).updated, post.updated)
+
+    def test_variants_are_recorded_for_picture(self):
+        """Копии картинки записаны в таблицу и попадают в <picture>."""
+        buffer = BytesIO()
+        Image.new('RGB', (700, 400), 'red').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile(
+            name='wide.png', content=buffer.getvalue(),
+            content_type='image/png')
+        with override_settings(THUMBNAIL_WORKERS=0):
+            post = Post.objects.create(
+                text='test_text', author=self.author, image=uploaded)
+            thumbnails.generate(post.pk)
+        widths = set(post.image_variants.values_list('width', flat=True))
+        # Копий шире исходной картинки не бывает
+        self.assertEqual(widths, {320, 640})
+        formats = set(post.image_variants.values_list('format', flat=True))
+        self.assertIn(ImageVariant.JPEG, formats)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'src="/media/variants/')
+        if ImageVariant.WEBP in formats:
+            self.assertContains(response, 'type="image/webp"')
+        post.delete()
+        self.assertFalse(ImageVariant.objects.exists())
+
+    def test_page_thumbnails_are_resolved_in_one_query(self):
+        """Миниатюры страницы разрешаются одним запросом, дальше — из LRU."""
+        posts = []
+        for index in range(3):
+            uploaded = SimpleUploadedFile(
+                name=f'small{index}.gif', content=SMALL_GIF,
+                content_type='image/gif')
+            post = Post.objects.create(
+                text='test_text', author=self.author, image=uploaded)
+            thumbnails.generate(post.pk)
+            posts.append(post)
+        cache.clear()
+        default.kvstore.lru.clear()
+        geometry, options = thumbnails.GEOMETRIES[0]
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(post.image for post in posts)
+        with self.assertNumQueries(0):
+            for post in posts:
+                self.assertIsNotNone(default.backend.get_ready(
+                    post.image, geometry, **options))
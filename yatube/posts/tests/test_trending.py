@@ -0,0 +1,83 @@
+import math
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Post, PostScore, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Lera')
+        cls.reader = User.objects.create_user(username='Ivan')
+        cls.old, cls.new = (
+            Post.objects.create(text=text, author=cls.author)
+            for text in ('старый', 'новый'))
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий')
+
+    def test_score_is_decayed_sum(self):
+        """Оценка — сумма весов, каждый затухает вдвое за полупериод."""
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        trending.record(self.old.pk, 4, now - 2 * half_life)
+        trending.record(self.old.pk, 2, now - half_life)
+        trending.record(self.old.pk, 1, now)
+        score = PostScore.objects.get(post=self.old).score
+        self.assertAlmostEqual(trending.current(score, now), 3)
+
+    def test_comments_and_follows_rank_posts(self):
+        """Комментарии поднимают пост, подписка — свежий пост автора."""
+        self.comment(self.old, 2)
+        self.assertEqual(trending.top(), [self.old])
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = trending.top()
+        self.assertEqual(posts, [self.new, self.old])
+        self.assertAlmostEqual(
+            posts[0].heat, trending.FOLLOW_WEIGHT, places=3)
+
+    def test_old_events_fade(self):
+        """Давние события уступают свежим и не доходят до страницы."""
+        now = timezone.now()
+        trending.record(self.old.pk, 100, now - timedelta(days=3))
+        trending.record(self.new.pk, 1, now)
+        self.assertEqual(trending.top(moment=now), [self.new])
+
+    def test_prune_keeps_capacity_best(self):
+        now = timezone.now()
+        for weight, post in enumerate((self.old, self.new), start=1):
+            trending.record(post.pk, weight, now)
+        self.assertEqual(trending.prune(capacity=1, moment=now), 1)
+        self.assertEqual(
+            list(PostScore.objects.values_list('post', flat=True)),
+            [self.new.pk])
+        later = now + timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * math.log2(
+                2 / trending.MIN_SCORE) + 1)
+        self.assertEqual(trending.prune(moment=later), 1)
+
+    def test_writes_prune_sometimes(self):
+        with mock.patch('posts.trending.prune') as prune, mock.patch(
+                'posts.trending.random.random', return_value=0):
+            self.comment(self.old)
+        prune.assert_called_once_with()
+
+    def test_page_and_command(self):
+        self.comment(self.new)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'], [self.new])
+        self.assertContains(response, 'новый')
+        out = StringIO()
+        call_command('trending_posts', '--prune', stdout=out)
+        self.assertIn(f'{self.new.pk}: 1.00', out.getvalue())
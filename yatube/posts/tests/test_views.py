@@ -1,8 +1,10 @@
 from django import forms
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
 from posts.models import Group, Post, User
+from posts.paginators import encode_cursor
 
 
 class PostViewTests(TestCase):
@@ -177,6 +179,10 @@ class PaginatorViewsTest(TestCase):
             group=cls.group) for i in range(13))
         cls.posts = Post.objects.bulk_create(batch)
 
+    def setUp(self):
+        # Анонимные страницы кэшируются целиком, а тестам нужен контекст
+        cache.clear()
+
     def test_index_first_page_contains_ten_records(self):
         """Тест: на первой странице index должно быть 10 постов."""
         response = self.client.get(reverse('posts:index'))
@@ -210,3 +216,52 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:profile', kwargs={
             'username': PaginatorViewsTest.author.username}) + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_index_cursor_pages(self):
+        """Тест: курсорные ссылки листают index вперёд и назад."""
+        first = self.client.get(reverse('posts:index'))
+        page = first.context['page_obj']
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        second = self.client.get(
+            reverse('posts:index') + f'?cursor={page.next_cursor}')
+        second_page = second.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        back = self.client.get(
+            reverse('posts:index')
+            + f'?cursor={second_page.previous_cursor}')
+        self.assertEqual(
+            list(back.context['page_obj']), list(page))
+
+    def test_cursor_page_is_stable_under_inserts(self):
+        """Тест: новые посты не сдвигают уже открытую страницу."""
+        first = self.client.get(reverse('posts:index'))
+        next_cursor = first.context['page_obj'].next_cursor
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={next_cursor}')
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Тест: битый курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?cursor=xx')
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_with_bad_date_falls_back_to_first_page(self):
+        """Тест: курсор с невозможной датой открывает первую страницу."""
+        cursor = encode_cursor(['2020-13-45 25:00:00', 1])
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_with_empty_fields_falls_back_to_first_page(self):
+        """Тест: курсор с пустыми полями открывает первую страницу."""
+        for position in ([None, None], ['2020-01-01', None]):
+            with self.subTest(position=position):
+                response = self.client.get(
+                    reverse('posts:index')
+                    + f'?cursor={encode_cursor(position)}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page_obj']), 10)
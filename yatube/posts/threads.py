@@ -0,0 +1,110 @@
+"""Ветки ответов на комментарии в виде материализованного пути.
+
+Путь комментария — сегменты всех его предков и его собственный,
+через точку. Сегмент кодирует (pub_date, id) шестнадцатеричными числами
+фиксированной ширины, поэтому сортировка по пути — обход дерева
+в глубину, а внутри каждого уровня ответы идут по pub_date, как и раньше.
+Ветка целиком — это диапазон путей, который читается одним запросом
+по индексу (post, path). Глубина ограничена: под корнем показываем
+DISPLAY_DEPTH уровней ответов, а ветки глубже сворачиваем в ссылку
+с числом ответов, которое хранится в descendants и сдвигается при
+каждом ответе.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import F
+
+from .models import Comment
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+SEPARATOR = '.'
+# Следующий символ после разделителя: путь + END больше путей всех
+# потомков (путь + '.' + …), но меньше путей следующих соседей — сегменты
+# одной ширины, и соседи отличаются раньше, шестнадцатеричной цифрой,
+# а цифры больше '/'
+END = '/'
+# Глубже ответ не вкладывается, а становится соседом того, кому отвечают;
+# при ширине сегмента 24 символа путь укладывается в 255
+MAX_DEPTH = 8
+# Сколько уровней ответов под корнем ветки разворачивается сразу
+# (глубины от 0 до DISPLAY_DEPTH включительно)
+DISPLAY_DEPTH = 3
+ROOT_ORDERING = ('path',)
+# Полям комментария из шаблона хватает этих колонок
+FIELDS = ('post_id', 'pub_date', 'text', 'path', 'depth', 'descendants',
+          'author__username')
+
+
+def segment(pub_date, pk):
+    micros = (pub_date - EPOCH) // timedelta(microseconds=1)
+    return f'{micros:014x}{pk:010x}'
+
+
+def ancestor_ids(path):
+    """id предков из пути, от корня; сам комментарий последним."""
+    return [int(part[14:], 16) for part in path.split(SEPARATOR)]
+
+
+def reply_target(parent):
+    """Комментарий, к которому на самом деле прикрепится ответ."""
+    if parent is not None and parent.depth >= MAX_DEPTH:
+        return parent.parent
+    return parent
+
+
+def attach(comment):
+    """Прописывает путь нового комментария и считает его у предков."""
+    own = segment(comment.pub_date, comment.pk)
+    parent = comment.parent
+    if parent is None:
+        comment.path, comment.depth = own, 0
+    else:
+        comment.path = f'{parent.path}{SEPARATOR}{own}'
+        comment.depth = parent.depth + 1
+    Comment.objects.filter(pk=comment.pk).update(
+        path=comment.path, depth=comment.depth)
+    Comment.objects.filter(pk__in=ancestor_ids(comment.path)[:-1]).update(
+        descendants=F('descendants') + 1)
+
+
+def detach(comment):
+    """Снимает удалённый комментарий со счётчиков предков.
+
+    Ответы удаляются каскадом и снимают себя сами, так что каждый
+    предок уменьшается ровно на размер удалённой ветки.
+    """
+    if comment.path:
+        Comment.objects.filter(
+            pk__in=ancestor_ids(comment.path)[:-1]).update(
+            descendants=F('descendants') - 1)
+
+
+def _collapse(comments, limit):
+    for comment in comments:
+        comment.collapsed = comment.depth == limit and comment.descendants
+    return comments
+
+
+def load(post_id, roots):
+    """Ветки корней страницы до глубины DISPLAY_DEPTH, одним запросом."""
+    if not roots:
+        return []
+    comments = Comment.objects.filter(
+        post=post_id,
+        path__gte=roots[0].path,
+        path__lt=roots[-1].path + END,
+        depth__lte=DISPLAY_DEPTH,
+    ).select_related('author').only(*FIELDS).order_by('path')
+    return _collapse(list(comments), DISPLAY_DEPTH)
+
+
+def replies(comment):
+    """Свёрнутая часть ветки под комментарием, тоже одним запросом."""
+    limit = comment.depth + DISPLAY_DEPTH
+    comments = Comment.objects.filter(
+        post=comment.post_id,
+        path__gt=comment.path + SEPARATOR,
+        path__lt=comment.path + END,
+        depth__lte=limit,
+    ).select_related('author').only(*FIELDS).order_by('path')
+    return _collapse(list(comments), limit)
@@ -0,0 +1,250 @@
+"""Миниатюры постов готовятся при загрузке картинки, а не при показе.
+
+post_create и post_edit ставят пост в очередь после коммита транзакции,
+пул процессов рисует адаптивные копии (posts.variants) и все миниатюры
+из GEOMETRIES, а {% thumbnail %} в шаблонах только читает готовые
+из хранилища ключей sorl-thumbnail: пока миниатюры нет, вместо неё
+отдаётся заглушка Placeholder, и запрос не тратит время на Pillow.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django import db
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import caching, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые запрашивают шаблоны постов; новый {% thumbnail %}
+# в шаблоне нужно добавить и сюда, иначе он навсегда останется заглушкой
+GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+# Сколько найденных записей хранилища ключей держит каждый процесс
+LRU_SIZE = 10000
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Placeholder:
+    """Заглушка на месте миниатюры, которая ещё готовится."""
+
+    is_placeholder = True
+    url = ''
+
+    def __init__(self, geometry):
+        self.width, self.height = parse_geometry(geometry)
+
+
+class EagerThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не рисует миниатюры при рендеринге.
+
+    Рисовать разрешено только внутри generate(); в остальных местах
+    get_thumbnail() возвращает готовую миниатюру или Placeholder.
+    Пачку миниатюр стоит заранее разрешить через prefetch().
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if getattr(_local, 'generating', False):
+            return super().get_thumbnail(file_, geometry_string, **options)
+        return (self.get_ready(file_, geometry_string, **options)
+                or Placeholder(geometry_string))
+
+    def get_ready(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры: имя вычисляется, файл не открывается."""
+        source = ImageFile(file_)
+        # Имя миниатюры зависит от всех опций, поэтому дополняем их так же,
+        # как ThumbnailBackend.get_thumbnail()
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+class BatchedKVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl-thumbnail с пакетным чтением и LRU в процессе.
+
+    prefetch() разрешает миниатюры всей страницы одним get_many к кэшу
+    и одним запросом к базе; найденные записи запоминаются в LRU
+    процесса, так что следующие {% thumbnail %} не ходят никуда.
+    Отсутствие миниатюры в LRU не попадает: её может дорисовать пул.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lru = OrderedDict()
+        self.lru_lock = threading.Lock()
+
+    def _remember(self, key, value):
+        with self.lru_lock:
+            self.lru[key] = value
+            self.lru.move_to_end(key)
+            while len(self.lru) > LRU_SIZE:
+                self.lru.popitem(last=False)
+
+    def _recall(self, key):
+        with self.lru_lock:
+            value = self.lru.get(key)
+            if value is not None:
+                self.lru.move_to_end(key)
+            return value
+
+    def _forget(self, keys):
+        with self.lru_lock:
+            for key in keys:
+                self.lru.pop(key, None)
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self._forget(keys)
+
+    def prefetch(self, image_files):
+        """Загружает записи image_files в LRU пачкой."""
+        keys = {add_prefix(image_file.key) for image_file in image_files}
+        with self.lru_lock:
+            keys -= self.lru.keys()
+        if not keys:
+            return
+        found = self.cache.get_many(list(keys))
+        missing = keys - found.keys()
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            # Как и _get_raw, запоминаем в кэше и отсутствие записи,
+            # чтобы не спрашивать базу снова
+            self.cache.set_many({
+                key: stored.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(stored)
+        for key, value in found.items():
+            if value != cached_db_kvstore.EMPTY_VALUE:
+                self._remember(key, value)
+
+
+def prefetch(images):
+    """Разрешает миниатюры всех GEOMETRIES для картинок одной пачкой."""
+    image_files = [
+        default.backend.thumbnail_file(image, geometry, **options)
+        for image in images if image
+        for geometry, options in GEOMETRIES
+    ]
+    if image_files:
+        default.kvstore.prefetch(image_files)
+
+
+def _feeds(post):
+    feeds = [
+        caching.index_feed(),
+        caching.profile_feed(post.author.username),
+        caching.post_feed(post.pk),
+    ]
+    if post.group_id:
+        feeds.append(caching.group_feed(post.group.slug))
+    return feeds
+
+
+def generate(post_id):
+    """Рисует миниатюры и адаптивные копии картинки поста.
+
+    После этого сбрасывает кэш страниц, где вместо неё была заглушка.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    if post is None:
+        return
+    # Без картинки остаётся только убрать копии прежней
+    variants.build(post)
+    if post.image:
+        _local.generating = True
+        try:
+            for geometry, options in GEOMETRIES:
+                default.backend.get_thumbnail(
+                    post.image, geometry, **options)
+        finally:
+            _local.generating = False
+    # Карточка поста кэшируется по updated: сдвигаем его в обход сигналов,
+    # чтобы не раскладывать пост по лентам ещё раз
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    caching.bump(*_feeds(post))
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    # При spawn процесс стартует с нуля, при fork — наследует соединения
+    # родителя, которыми пользоваться нельзя
+    if not apps.ready:
+        django.setup()
+    db.connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                initializer=_init_worker)
+        return _executor
+
+
+def _report(future):
+    if future.exception() is not None:
+        logger.error(
+            'Thumbnail generation failed', exc_info=future.exception())
+
+
+def _submit(post_id):
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post_id)
+        return
+    _get_executor().submit(generate, post_id).add_done_callback(_report)
+
+
+def enqueue(post):
+    """Ставит картинку поста в очередь после коммита текущей транзакции."""
+    transaction.on_commit(partial(_submit, post.pk))
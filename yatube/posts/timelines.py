@@ -0,0 +1,234 @@
+"""Ленты подписок: гибрид раскладки при записи и подмешивания при чтении.
+
+Пост обычного автора сразу раскладывается по строкам Timeline всех его
+подписчиков, поэтому чтение /follow/ — это диапазон по индексу одной
+ленты. Авторы, у которых подписчиков не меньше FEED_FANOUT_THRESHOLD,
+переводятся в pull-режим: их посты не раскладываются, а сливаются
+с лентой при чтении, так что одна публикация не вызывает лавину записей.
+
+Кэш страницы /follow/ версионируется поколением ленты читателя и
+лентами его pull-авторов. Поколение ленты читателя сдвигают подписки
+и любые изменения постов его push-авторов: раскладка нового поста,
+правка и удаление (см. bump_followers), так что версия не растёт
+с числом подписок.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from . import caching, counters, follows
+from .models import FeedStrategy, Follow, Post, Timeline
+from .paginators import (FEED_ORDERING, POSTS_PER_PAGE,
+                         MergedCursorPaginator, get_page)
+
+BATCH_SIZE = 500
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+
+def _entry(user_id, post):
+    return Timeline(
+        user_id=user_id,
+        post_id=post.pk,
+        author_id=post.author_id,
+        pub_date=post.pub_date,
+    )
+
+
+def _entries(user_id, posts):
+    return [_entry(user_id, post) for post in posts]
+
+
+def trim(user_id):
+    """Обрезает ленту читателя до settings.TIMELINE_MAX_LENGTH записей."""
+    stale = Timeline.objects.filter(user_id=user_id).order_by(
+        *TIMELINE_ORDERING).values('pk')[settings.TIMELINE_MAX_LENGTH:]
+    Timeline.objects.filter(pk__in=stale).delete()
+
+
+def overfull():
+    """Id читателей, чьи ленты длиннее TIMELINE_MAX_LENGTH."""
+    return Timeline.objects.values('user_id').annotate(
+        length=Count('pk')).filter(
+        length__gt=settings.TIMELINE_MAX_LENGTH).values_list(
+        'user_id', flat=True)
+
+
+TRIM = (
+    'DELETE FROM {table} WHERE id IN ('
+    ' SELECT id FROM ('
+    '  SELECT id, ROW_NUMBER() OVER ('
+    '   PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+    '  ) AS position FROM {table} WHERE user_id IN ({users})'
+    ' ) AS ranked WHERE position > %s)'
+)
+
+
+def trim_many(user_ids):
+    """Обрезает ленты нескольких читателей одним запросом."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    sql = TRIM.format(
+        table=connection.ops.quote_name(Timeline._meta.db_table),
+        users=', '.join(['%s'] * len(user_ids)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*user_ids, settings.TIMELINE_MAX_LENGTH])
+        return cursor.rowcount
+
+
+def is_pulled(author_id):
+    return FeedStrategy.objects.filter(
+        author_id=author_id, strategy=FeedStrategy.PULL).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    entries = [
+        _entry(user_id, post) for user_id in follower_ids.iterator()
+    ]
+    Timeline.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    # Ленты не обрезаются здесь: запрос на каждого подписчика сделал бы
+    # публикацию O(подписчиков). Лишнее снимает trim_timelines
+    caching.bump(*(caching.follow_feed(entry.user_id) for entry in entries))
+
+
+def bump_followers(author_id):
+    """Сдвигает ленты подписчиков push-автора после правки его поста.
+
+    Ленты подписчиков pull-автора версионируются его профилем,
+    см. follow_feeds().
+    """
+    if is_pulled(author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    caching.bump(*map(caching.follow_feed, follower_ids))
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').only('pk', 'author_id', 'pub_date')
+    Timeline.objects.bulk_create(
+        _entries(user_id, posts[:settings.TIMELINE_MAX_LENGTH]),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту читателя с нуля по таблице Follow."""
+    Timeline.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id).exclude(
+        author__feed_strategy__strategy=FeedStrategy.PULL).order_by(
+        '-pub_date', '-id').only('pk', 'author_id', 'pub_date')
+    Timeline.objects.bulk_create(
+        _entries(user_id, posts[:settings.TIMELINE_MAX_LENGTH]),
+        batch_size=BATCH_SIZE)
+
+
+def classify(author_id, create=True):
+    """Пересчитывает стратегию автора по числу его подписчиков.
+
+    В pull-режим автор уходит при достижении порога, а возвращается
+    только когда подписчиков становится вдвое меньше, чтобы стратегия
+    не переключалась туда-обратно на каждой подписке.
+    """
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    followers = counters.get(counters.FOLLOWERS, author_id)
+    if create:
+        strategy, _ = FeedStrategy.objects.get_or_create(
+            author_id=author_id)
+    else:
+        strategy = FeedStrategy.objects.filter(author_id=author_id).first()
+        if strategy is None:
+            return None
+    strategy.followers = followers
+    if strategy.strategy == FeedStrategy.PUSH and followers >= threshold:
+        strategy.strategy = FeedStrategy.PULL
+        strategy.changed = timezone.now()
+    elif (strategy.strategy == FeedStrategy.PULL
+            and followers < threshold // 2):
+        # Посты, вышедшие в pull-режиме, досыпаем в ленты подписчиков
+        posts = list(Post.objects.filter(
+            author_id=author_id, pub_date__gte=strategy.changed).order_by(
+            '-pub_date', '-id')[:settings.TIMELINE_MAX_LENGTH])
+        follower_ids = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        for user_id in follower_ids.iterator():
+            Timeline.objects.bulk_create(
+                _entries(user_id, posts),
+                batch_size=BATCH_SIZE, ignore_conflicts=True)
+        strategy.strategy = FeedStrategy.PUSH
+        strategy.changed = timezone.now()
+    # update(), а не save(): при каскадном удалении автора строка может
+    # быть уже удалена, и save() вставил бы её заново
+    FeedStrategy.objects.filter(author_id=author_id).update(
+        strategy=strategy.strategy,
+        followers=strategy.followers,
+        changed=strategy.changed,
+    )
+    return strategy
+
+
+def _followed(user):
+    return list(follows.followed_ids(user))
+
+
+def _same(post):
+    return post
+
+
+def follow_sources(user):
+    """Своя лента читателя (строки Timeline) и посты его pull-авторов."""
+    pulled = list(FeedStrategy.objects.filter(
+        strategy=FeedStrategy.PULL, author__following__user=user
+    ).values_list('author_id', flat=True))
+    own = Timeline.objects.filter(user=user).exclude(author_id__in=pulled)
+    return own, [Post.objects.filter(author_id=author_id)
+                 for author_id in pulled]
+
+
+def follow_feeds(user):
+    """Ленты, из поколений которых собирается версия /follow/ читателя."""
+    pulled = FeedStrategy.objects.filter(
+        strategy=FeedStrategy.PULL, author__following__user=user
+    ).values_list('author__username', flat=True)
+    return [caching.follow_feed(user.pk),
+            *map(caching.profile_feed, pulled)]
+
+
+def follow_page(request, user):
+    """Страница ленты подписок: своя лента плюс посты pull-авторов."""
+    own, pulled = follow_sources(user)
+    sources = [(
+        own.select_related('post__author', 'post__group'),
+        TIMELINE_ORDERING,
+        attrgetter('post'),
+    )]
+    sources += [
+        (posts.select_related('author', 'group'), FEED_ORDERING, _same)
+        for posts in pulled
+    ]
+    # Нумерованный режим ?page= читает ленту по-старому, через join
+    fallback = Post.objects.filter(
+        author__following__user=user).select_related('author', 'group')
+    return get_page(request, MergedCursorPaginator(
+        sources, POSTS_PER_PAGE, fallback,
+        count=lambda: sum(counters.get_many(
+            counters.AUTHOR_POSTS, _followed(user)).values())))
@@ -0,0 +1,111 @@
+"""Популярные посты: оценка, затухающая со временем, без пересчётов.
+
+Оценка поста — сумма весов его событий (комментариев и подписок,
+которые он принёс автору), и каждый вес затухает вдвое за
+TRENDING_HALF_LIFE. Затухание общее для всех постов, поэтому хранить
+можно не саму оценку, а её логарифм, приведённый к неподвижной эпохе:
+
+    score = ln Σ w · e^(λ·(t − EPOCH)).
+
+Старые значения никогда не пересчитываются, порядок постов по score
+совпадает с порядком по текущей оценке, а новое событие — это один
+upsert с logaddexp, атомарный в самой базе. Вершина рейтинга — первые
+строки индекса по score, и страница читает ровно их. Посты, чья
+оценка затухла, и всё, что ниже CAPACITY лучших, удаляет prune():
+изредка при записи и командой trending_posts --prune.
+
+Отписки и удалённые комментарии оценку не уменьшают: вычитание
+в логарифмах неустойчиво, а их вклад и так затухает.
+"""
+import math
+import random
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post, PostScore
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+COMMENT_WEIGHT = 1.0
+FOLLOW_WEIGHT = 3.0
+# Сколько постов показывать и сколько держать в таблице
+SHOWN = 20
+CAPACITY = 1000
+# Оценка, ниже которой пост из рейтинга выпадает
+MIN_SCORE = 0.05
+# С такой вероятностью запись заодно подрезает таблицу
+PRUNE_PROBABILITY = 0.01
+
+# Вставка или logaddexp(a, b) = max(a, b) + ln(1 + e^-|a - b|).
+# Сырой SQL: выражение ORM собирается дольше, чем выполняется запрос
+RECORD = '''
+INSERT INTO posts_postscore (post_id, score) VALUES (%s, %s)
+ON CONFLICT (post_id) DO UPDATE SET score =
+    MAX(score, excluded.score)
+    + LN(1 + EXP(-ABS(score - excluded.score)))
+'''
+
+
+def rate():
+    """λ: во сколько раз в логарифме затухает оценка за секунду."""
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def at(moment):
+    """Логарифм единичного события в момент moment."""
+    return rate() * (moment - EPOCH).total_seconds()
+
+
+def current(score, moment=None):
+    """Текущая, затухшая к моменту moment оценка из хранимой score."""
+    return math.exp(score - at(moment or _now()))
+
+
+def record(post_id, weight, moment=None):
+    """Добавляет посту событие с весом weight одним запросом."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            RECORD, [post_id, math.log(weight) + at(moment or _now())])
+    if random.random() < PRUNE_PROBABILITY:
+        prune()
+
+
+def comment_added(comment):
+    record(comment.post_id, COMMENT_WEIGHT, comment.pub_date)
+
+
+def follow_gained(follow):
+    """Новый подписчик засчитывается самому свежему посту автора."""
+    post_id = Post.objects.filter(author=follow.author_id).order_by(
+        '-pub_date').values_list('pk', flat=True).first()
+    if post_id is not None:
+        record(post_id, FOLLOW_WEIGHT)
+
+
+def top(limit=SHOWN, moment=None):
+    """Самые популярные посты с текущей оценкой в post.heat."""
+    moment = moment or _now()
+    threshold = math.log(MIN_SCORE) + at(moment)
+    scores = PostScore.objects.filter(score__gte=threshold).select_related(
+        'post__author', 'post__group').order_by('-score')[:limit]
+    posts = []
+    for row in scores:
+        row.post.heat = current(row.score, moment)
+        posts.append(row.post)
+    return posts
+
+
+def prune(capacity=CAPACITY, moment=None):
+    """Удаляет затухшие оценки и всё ниже capacity лучших."""
+    threshold = math.log(MIN_SCORE) + at(moment or _now())
+    deleted = PostScore.objects.filter(score__lt=threshold).delete()[0]
+    cutoff = PostScore.objects.order_by('-score').values_list(
+        'score', flat=True)[capacity:capacity + 1].first()
+    if cutoff is not None:
+        deleted += PostScore.objects.filter(score__lte=cutoff).delete()[0]
+    return deleted
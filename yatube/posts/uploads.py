@@ -0,0 +1,102 @@
+"""Приём картинок с ограниченным расходом памяти.
+
+BoundedImageUploadHandler пишет загрузку на диск кусками и сразу
+перестаёт её принимать, если она больше IMAGE_UPLOAD_MAX_BYTES. Размер
+в пикселях проверяется по заголовку, без декодирования, поэтому
+«бомба распаковки» отклоняется раньше, чем займёт память. normalize()
+затем уменьшает слишком большие оригиналы и убирает EXIF, так что
+в хранилище попадают картинки ограниченного размера.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+TOO_LARGE = 'Файл больше {limit} МБ.'
+TOO_MANY_PIXELS = 'Картинка больше {limit} мегапикселей.'
+# Форматы, которые пересохраняем без потери анимации и прозрачности
+NORMALIZED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и отсекает слишком большие.
+
+    Отклонённый файл не теряется молча: у него появляется атрибут
+    upload_error, и форма показывает эту ошибку у поля.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.error = TOO_LARGE.format(
+                limit=settings.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024))
+            # Уже записанное больше не нужно
+            self.file.seek(0)
+            self.file.truncate()
+            return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.upload_error = self.error or check_header(upload)
+        return upload
+
+
+def check_header(upload):
+    """Ошибка для картинки со слишком многими пикселями или None.
+
+    Image.open читает только заголовок, пиксели не декодируются.
+    Нечитаемые файлы пропускаются: их отклонит ImageField формы.
+    """
+    error = TOO_MANY_PIXELS.format(limit=settings.IMAGE_MAX_PIXELS // 10 ** 6)
+    try:
+        with Image.open(upload.temporary_file_path()) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        return error
+    except OSError:
+        return None
+    finally:
+        upload.seek(0)
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        return error
+    return None
+
+
+def normalize(upload):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE и убирает EXIF.
+
+    Файл перезаписывается на месте. Анимацию и форматы вне
+    NORMALIZED_FORMATS не трогаем, как и картинки, которым нечего менять.
+    """
+    limit = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+        unchanged = (
+            image_format not in NORMALIZED_FORMATS
+            or getattr(image, 'is_animated', False)
+            or (max(image.size) <= limit and not image.getexif()))
+        if not unchanged:
+            # JPEG сразу декодируется в уменьшенном масштабе
+            image.draft('RGB', (limit, limit))
+            normalized = ImageOps.exif_transpose(image)
+            normalized.thumbnail((limit, limit), Image.LANCZOS)
+    upload.seek(0)
+    if unchanged:
+        return upload
+    if image_format == 'JPEG' and normalized.mode not in ('RGB', 'L'):
+        normalized = normalized.convert('RGB')
+    upload.truncate()
+    # Без exif=... Pillow не переносит метаданные в новый файл
+    normalized.save(upload, image_format, quality=90)
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
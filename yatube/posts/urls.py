@@ -10,8 +10,15 @@ urlpatterns = [
     path('', views.index, name='index'),
     # Отдельная страница групп
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    # Лента хештега
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
+    # Популярные посты
+    path('trending/', views.trending_posts, name='trending'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
+    # Выгрузка постов и комментариев автора
+    path('profile/<str:username>/export/',
+         views.profile_export, name='profile_export'),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     # Создание и редактирование записи
@@ -19,6 +26,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    # Следующая пачка комментариев, фрагментом разметки
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
+    # Свёрнутая часть ветки ответов
+    path('posts/<int:post_id>/comments/<int:comment_id>/replies/',
+         views.comment_replies, name='comment_replies'),
+    # Поиск по постам и комментариям
+    path('search/', views.search, name='search'),
     path('follow/',
          views.follow_index, name='follow_index'),
     path('profile/<str:username>/follow/',
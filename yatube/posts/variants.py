@@ -0,0 +1,107 @@
+"""Адаптивные копии картинок постов для <picture>/srcset.
+
+Для каждой картинки заранее готовится набор ширин в каждом формате,
+который умеет сохранять установленный Pillow (AVIF, WebP), и в JPEG
+как запасном варианте для всех браузеров. Копии записываются
+в ImageVariant, поэтому шаблону хватает строк таблицы: ни файловую
+систему, ни саму картинку при рендеринге трогать не нужно.
+"""
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import ImageVariant
+
+WIDTHS = (320, 640, 960)
+# Пропорции карточки в ленте, как у прежней миниатюры 960x339
+ASPECT = (960, 339)
+QUALITY = 80
+# От лучшего сжатия к худшему: в таком порядке идут <source>
+FORMATS = (
+    (ImageVariant.AVIF, 'AVIF', 'image/avif', 'avif'),
+    (ImageVariant.WEBP, 'WEBP', 'image/webp', 'webp'),
+    (ImageVariant.JPEG, 'JPEG', 'image/jpeg', 'jpg'),
+)
+MIME_TYPES = {code: mime for code, _, mime, _ in FORMATS}
+
+
+def supported_formats():
+    """Форматы, которые можно сохранить установленным Pillow."""
+    Image.init()
+    return [
+        (code, pillow_format, extension)
+        for code, pillow_format, _, extension in FORMATS
+        if pillow_format in Image.SAVE
+    ]
+
+
+def widths(source_width):
+    """Ширины не больше исходной; самая узкая есть всегда."""
+    fitting = [width for width in WIDTHS if width <= source_width]
+    return fitting or WIDTHS[:1]
+
+
+def clear(post):
+    """Удаляет копии картинки поста; файлы удаляет сигнал post_delete."""
+    ImageVariant.objects.filter(post=post).delete()
+
+
+def build(post):
+    """Готовит все копии картинки поста и записывает их в таблицу."""
+    clear(post)
+    if not post.image:
+        return []
+    with post.image.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    created = []
+    for width in widths(image.width):
+        height = round(width * ASPECT[1] / ASPECT[0])
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for code, pillow_format, extension in supported_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, quality=QUALITY)
+            variant = ImageVariant(
+                post=post, format=code, width=width, height=height)
+            variant.file.save(
+                f'{post.pk}-{width}.{extension}',
+                ContentFile(buffer.getvalue()), save=False)
+            created.append(variant)
+    return ImageVariant.objects.bulk_create(created)
+
+
+def picture(variants):
+    """Данные для <picture>: источники по форматам и запасной <img>.
+
+    variants — уже загруженные копии одного поста (prefetch_related),
+    возвращает None, если копий ещё нет.
+    """
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(variant)
+    if not by_format:
+        return None
+    fallback_format = (
+        ImageVariant.JPEG if ImageVariant.JPEG in by_format
+        else next(iter(by_format)))
+    sources = [
+        {
+            'type': MIME_TYPES[code],
+            'srcset': ', '.join(
+                f'{variant.file.url} {variant.width}w'
+                for variant in by_format[code]),
+        }
+        for code, _, _, _ in FORMATS
+        if code in by_format and code != fallback_format
+    ]
+    fallback = by_format[fallback_format]
+    largest = fallback[-1]
+    return {
+        'sources': sources,
+        'src': largest.file.url,
+        'srcset': ', '.join(
+            f'{variant.file.url} {variant.width}w' for variant in fallback),
+        'width': largest.width,
+        'height': largest.height,
+    }
@@ -1,71 +1,192 @@
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_GET, require_http_methods
 
+from . import (caching, counters, exports, follows, fulltext, hashtags,
+               threads, thumbnails, timelines, trending)
+from .decorators import cache_anonymous_page
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
+from .models import Group, Post, PostTag, Tag, User, Comment, Follow
+from .paginators import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                         CursorPaginator, paginate)
+
+
+def newest_post(**lookups):
+    return Post.objects.filter(**lookups).aggregate(
+        newest=Max('pub_date'))['newest']
+
+
+def post_feeds(post_id, **kwargs):
+    """Ленты страницы поста: сам пост и профиль автора (число его постов)."""
+    feeds = [caching.post_feed(post_id)]
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True).first()
+    if username is not None:
+        feeds.append(caching.profile_feed(username))
+    return feeds
+
+
+def newest_in_post(post_id):
+    dates = Post.objects.filter(pk=post_id).aggregate(
+        post=Max('pub_date'), comment=Max('comments__pub_date'))
+    return max(filter(None, dates.values()), default=None)
 
 
 @require_GET
+@cache_anonymous_page(
+    feeds=lambda: [caching.index_feed()],
+    newest=newest_post)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginate(
+        request, posts, count=lambda: counters.get(counters.ALL_POSTS))
     template = 'posts/index.html'
-    context = {'page_obj': page_obj}
+    context = {
+        'page_obj': page_obj,
+        'feed_version': caching.version(caching.index_feed()),
+    }
     return render(request, template, context)
 
 
 @require_GET
+@cache_anonymous_page(
+    feeds=lambda slug: [caching.group_feed(slug)],
+    newest=lambda slug: newest_post(group__slug=slug))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.group_posts.select_related('author', 'group')
+    page_obj = paginate(request, posts, count=lambda: counters.get(
+        counters.GROUP_POSTS, group.pk))
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': caching.version(caching.group_feed(group.slug)),
+    }
+    return render(request, template, context)
+
+
+@require_GET
+@cache_anonymous_page(
+    feeds=lambda name: [caching.tag_feed(name)],
+    newest=lambda name: PostTag.objects.filter(tag__name=name).aggregate(
+        newest=Max('pub_date'))['newest'])
+def tag_posts(request, name):
+    if name != name.lower():
+        return redirect('posts:tag_posts', name.lower())
+    tag = get_object_or_404(Tag, name=name)
+    page_obj = hashtags.tag_page(request, tag)
+    template = 'posts/tag_list.html'
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+        'trending': hashtags.trending(),
+        'feed_version': caching.version(caching.tag_feed(tag.name)),
     }
     return render(request, template, context)
 
 
 @require_GET
+def trending_posts(request):
+    # Рейтинг меняется с каждым комментарием, поэтому страница не
+    # кэшируется целиком: это одно чтение вершины индекса и карточки
+    template = 'posts/trending.html'
+    context = {
+        'posts': trending.top(),
+    }
+    return render(request, template, context)
+
+
+@require_GET
+@cache_anonymous_page(
+    feeds=lambda username: [caching.profile_feed(username)],
+    newest=lambda username: newest_post(author__username=username))
 def profile(request, username):
     # Здесь код запроса к модели и создание словаря контекста
     author = get_object_or_404(User, username=username)
-    posts = author.group_posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = author.group_posts.select_related('author', 'group')
+    count = counters.get(counters.AUTHOR_POSTS, author.pk)
+    page_obj = paginate(request, posts, count=lambda: count)
     template = 'posts/profile.html'
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
-    else:
-        following = False
+    following = follows.is_following(request.user, author.pk)
     context = {
         'page_obj': page_obj,
         'author': author,
         'following': following,
+        'count': count,
+        'followers': counters.get(counters.FOLLOWERS, author.pk),
+        'feed_version': caching.version(
+            caching.profile_feed(author.username)),
     }
     return render(request, template, context)
 
 
+@login_required
+@require_GET
+def profile_export(request, username):
+    """Все посты и комментарии автора одним файлом, без сборки в памяти."""
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    extension = request.GET.get('format', 'ndjson')
+    if extension not in exports.FORMATS:
+        return HttpResponseBadRequest('Формат выгрузки: ndjson или zip')
+    export, content_type = exports.FORMATS[extension]
+    response = StreamingHttpResponse(
+        export(author), content_type=content_type)
+    filename = quote(f'{author.username}.{extension}')
+    response['Content-Disposition'] = (
+        f"attachment; filename*=UTF-8''{filename}")
+    return response
+
+
+def comment_page(post_id, cursor):
+    """Пачка веток комментариев поста после курсора.
+
+    Курсор листает корни веток, а сами ветки вместе с авторами читаются
+    следующим запросом, диапазоном путей, и лежат в page.thread.
+    """
+    roots = Comment.objects.filter(post=post_id, depth=0).only('path')
+    page = CursorPaginator(
+        roots, COMMENTS_PER_PAGE, threads.ROOT_ORDERING).get_cursor_page(
+        cursor)
+    page.thread = threads.load(post_id, page.object_list)
+    return page
+
+
+def reply_to(post_id, comment_id):
+    """Комментарий поста, на который отвечают, или None."""
+    try:
+        comment_id = int(comment_id)
+    except (TypeError, ValueError):
+        return None
+    return Comment.objects.filter(post=post_id, pk=comment_id).first()
+
+
+@cache_anonymous_page(
+    feeds=post_feeds,
+    newest=newest_in_post)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.prefetch_related('image_variants'), pk=post_id)
     form = CommentForm()
-    count = post.author.group_posts.count()
-    comments = Comment.objects.filter(post=post_id)
+    count = counters.get(counters.AUTHOR_POSTS, post.author_id)
+    comments = comment_page(post_id, request.GET.get('comments'))
     template = 'posts/post_detail.html'
     context = {
         'post': post,
         'count': count,
         'form': form,
         'comments': comments,
+        'reply_to': reply_to(post_id, request.GET.get('reply_to')),
     }
     return render(request, template, context)
 
@@ -80,7 +201,11 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Пост и его раскладка по лентам подписчиков — одна транзакция
+        with transaction.atomic():
+            post.save()
+            if post.image:
+                thumbnails.enqueue(post)
         return redirect('posts:profile', username=post.author.username)
     template = 'posts/create_post.html'
     return render(request, template, {'form': form, 'groups': groups})
@@ -97,7 +222,10 @@ def post_edit(request, post_id):
         instance=post)
     if form.is_valid():
         template = 'posts:post_detail'
-        form.save()
+        with transaction.atomic():
+            form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue(post)
         return redirect(template, post_id=post.pk)
     groups = Group.objects.all()
     template = 'posts/create_post.html'
@@ -110,6 +238,35 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@require_GET
+@cache_anonymous_page(
+    feeds=post_feeds,
+    newest=newest_in_post)
+def post_comments(request, post_id):
+    """Фрагмент разметки со следующей пачкой комментариев для «Ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comment_page(post_id, request.GET.get('cursor'))
+    context = {
+        'post': post,
+        'comments': comments,
+        'thread': comments.thread,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@require_GET
+@cache_anonymous_page(
+    feeds=post_feeds,
+    newest=lambda post_id, comment_id: newest_in_post(post_id))
+def comment_replies(request, post_id, comment_id):
+    """Фрагмент разметки со свёрнутой частью ветки под комментарием."""
+    comment = get_object_or_404(
+        Comment.objects.only('post_id', 'path', 'depth'),
+        post=post_id, pk=comment_id)
+    context = {'thread': threads.replies(comment)}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -119,18 +276,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        comment.parent = threads.reply_target(
+            reply_to(post_id, request.POST.get('parent')))
+        with transaction.atomic():
+            comment.save()
     return redirect(template, post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_set = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_set, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timelines.follow_page(request, request.user)
     context = {
         'page_obj': page_obj,
+        'feed_version': caching.version(
+            *timelines.follow_feeds(request.user)),
+        'suggestions': follows.suggestions(request.user),
+        'live_events_url': settings.LIVE_EVENTS_URL,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -139,7 +300,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
 
@@ -147,5 +309,30 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follower = Follow.objects.filter(user=request.user, author=author)
-    follower.delete()
+    with transaction.atomic():
+        follower.delete()
     return redirect('posts:profile', username)
+
+
+@require_GET
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(
+        fulltext.find(query) if query else [],
+        POSTS_PER_PAGE).get_page(request.GET.get('page'))
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        page_obj.object_list)
+    snippets = fulltext.snippets(page_obj.object_list, query)
+    results = [
+        {'post': posts[post_id], 'snippet': snippets.get(post_id)}
+        for post_id in page_obj.object_list if post_id in posts
+    ]
+    template = 'posts/search.html'
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'results': results,
+        # Ссылки пагинатора должны сохранить сам запрос
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
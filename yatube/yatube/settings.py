@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -143,9 +145,69 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
-# подключаем кэширование
+# подключаем кэширование: файл SQLite, общий для всех воркеров;
+# путь к нему задаётся переменной окружения YATUBE_CACHE_PATH
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'yatube', 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
+
+# manage.py test подменяет общий кэш кэшем в памяти, см. core.testing;
+# pytest берёт тот же кэш из yatube.test_settings
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Ленты подписок: длина материализованной ленты читателя (лишнее
+# снимает периодическая команда trim_timelines) и число подписчиков,
+# начиная с которого посты автора подмешиваются при чтении
+TIMELINE_MAX_LENGTH = 1000
+FEED_FANOUT_THRESHOLD = 5000
+
+# За сколько часов хранятся почасовые итоги тегов для трендов
+TAG_ROLLUP_HOURS = 7 * 24
+
+# Журнал изменений для синхронизации: через сколько секунд события
+# сворачиваются до последнего по объекту и сколько дней хранятся
+CHANGES_COMPACT_AFTER = 60 * 60
+CHANGES_RETENTION_DAYS = 7
+
+# Поток «новых постов» для ленты подписок (сайдкар yatube/sse.py):
+# как часто он читает журнал изменений и пингует соединения, в секундах.
+# LIVE_EVENTS_URL — адрес потока для страницы; None — не подключаться
+LIVE_POLL_INTERVAL = 1
+LIVE_HEARTBEAT = 15
+LIVE_EVENTS_URL = None
+
+# За сколько секунд оценка популярного поста затухает вдвое
+TRENDING_HALF_LIFE = 6 * 60 * 60
+
+# Сколько хранится полностью отрендеренная страница для анонимов;
+# устаревает она раньше — по записи в ленту, см. posts.caching
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры рисуются при загрузке пулом из стольких процессов, а шаблоны
+# только читают готовые; 0 — рисовать сразу после коммита, без пула
+THUMBNAIL_BACKEND = 'posts.thumbnails.EagerThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+# Записи о готовых миниатюрах читаются пачкой на страницу и помнятся
+# в процессе, см. posts.thumbnails.BatchedKVStore
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchedKVStore'
+
+# Загрузки пишутся на диск кусками и отсекаются по размеру файла
+# и числу пикселей в заголовке; большие оригиналы уменьшаются
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedImageUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 25 * 1000 * 1000
+IMAGE_MAX_SIDE = 2560
+
+# Загруженные файлы хранятся по хешу содержимого с подсчётом ссылок;
+# миниатюрам sorl это не нужно, у них имена и так уникальны
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
@@ -0,0 +1,34 @@
+"""
+SSE sidecar for yatube project.
+
+Serves the "new posts in your feed" event stream (see posts.live) from
+an asyncio event loop next to the WSGI application:
+
+    python -m yatube.sse --host 127.0.0.1 --port 8001
+
+In production the same web server proxies /events/ here, so the stream
+shares the site's origin and session cookie.
+"""
+
+import argparse
+import asyncio
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup()
+
+from posts import live  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    options = parser.parse_args()
+    asyncio.run(live.serve(options.host, options.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+"""
+Django settings for running yatube tests under pytest.
+
+Same as yatube.settings, but with the in-memory cache from core.testing;
+manage.py test gets the same cache from core.testing.TestRunner.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+from core.testing import CACHES  # noqa: E402,F401,F811